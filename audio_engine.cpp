@@ -1,13 +1,21 @@
 #include <RtAudio.h>
 #include <pybind11/pybind11.h>
+#include <pybind11/numpy.h>
 #include <pybind11/stl.h>
+#include <algorithm>
+#include <array>
 #include <atomic>
+#include <chrono>
 #include <cmath>
+#include <cstdint>
+#include <deque>
+#include <fstream>
 #include <iostream>
 #include <vector>
 #include <memory>
 #include <Tonic.h>
 #include <mutex>
+#include <thread>
 #include <unordered_map>
 
 #define _USE_MATH_DEFINES  // Fix for M_PI on Windows
@@ -15,11 +23,22 @@
 
 #define SAMPLE_RATE 48000
 #define BUFFER_SIZE 256
+#define RECORDER_RING_SECONDS 4
+#define RECORDER_WRITE_FRAMES 16384
+#define LOAD_SHEDDING_HISTORY 64
+#define LOAD_SHEDDING_MAX_RANKED 1024
+#define TAP_RING_SECONDS 2
+#define SEQUENCER_EVENT_QUEUE 4096
+#define SEQUENCER_MAX_ACTIVE_NOTES 256
+#define MAX_EFFECT_BUSES 4
 
 // Base class for Tonic Synth Wrapper
 class SynthWrapper {
     public:
-        SynthWrapper() {
+        SynthWrapper() : priority(0), muted(false) {
+            for (auto& send : sends) {
+                send.store(0.0f, std::memory_order_relaxed);
+            }
             noteNum = synth.addParameter("polyNote", 0.0);
             pitchBend = synth.addParameter("pitchBend", 0.0);
             gate = synth.addParameter("polyGate", 0.0);
@@ -45,18 +64,83 @@ class SynthWrapper {
         Tonic::Synth& getSynth() {
             return synth;
         }
+
+        // Releases the note and lets it fade out, so the synth starts silent when it is used again.
+        // Renders on the calling thread, so the synth must not be registered with an engine.
+        virtual void silence() {
+            stopNote();
+        }
+
+        // Switches to a cheaper version of the synth while the engine is overloaded. May be called
+        // from any thread, the switch itself is made by applyReducedQuality on the audio thread.
+        virtual void setReducedQuality(bool) {}
+
+        // Called from the audio thread before the synth is rendered
+        virtual void applyReducedQuality() {}
+
+        // Synths with a lower priority are muted first while the engine is overloaded
+        void setPriority(int value) {
+            priority.store(value, std::memory_order_relaxed);
+        }
+
+        int getPriority() const {
+            return priority.load(std::memory_order_relaxed);
+        }
+
+        void setMuted(bool value) {
+            muted.store(value, std::memory_order_relaxed);
+        }
+
+        bool isMuted() const {
+            return muted.load(std::memory_order_relaxed);
+        }
+
+        // The level the synth is sent to a shared effect bus with, 0 to not feed the bus
+        void setSend(unsigned int bus, float level) {
+            sends.at(bus).store(level, std::memory_order_relaxed);
+        }
+
+        float getSend(unsigned int bus) const {
+            return sends.at(bus).load(std::memory_order_relaxed);
+        }
     
     protected:
         Tonic::Synth synth;
         Tonic::ControlParameter noteNum, gate, noteVelocity, pitchBend;
+        std::atomic<int> priority;
+        std::atomic<bool> muted;
+        std::array<std::atomic<float>, MAX_EFFECT_BUSES> sends;
     };
 
 // Derived class implementing a simple ADSR filter synth
 class TonicSimpleADSRFilterSynth : public SynthWrapper {
     public:
-        TonicSimpleADSRFilterSynth(const std::string& waveform, float attack, float decay, float sustain, float release, float baseFilterFreq, float filterQ) {
+        TonicSimpleADSRFilterSynth(const std::string& waveform, float attack, float decay, float sustain, float release, float baseFilterFreq, float filterQ)
+            : release(release), reducedQuality(false), appliedReducedQuality(false) {
             configureSynth(waveform, attack, decay, sustain, release, baseFilterFreq, filterQ);
         }
+
+        // Renders the release of the envelope, so neither the envelope nor the filter hold a trace of the note
+        void silence() override {
+            stopNote();
+            std::array<float, BUFFER_SIZE> buffer;
+            const double releaseFrames = std::ceil(static_cast<double>(release) * SAMPLE_RATE);
+            for (double frame = 0.0; frame < releaseFrames; frame += BUFFER_SIZE) {
+                synth.fillBufferOfFloats(buffer.data(), BUFFER_SIZE, 1);
+            }
+        }
+
+        // Swaps the 24 dB filter for a 12 dB one, both graphs are built upfront
+        void setReducedQuality(bool reduced) override {
+            reducedQuality.store(reduced, std::memory_order_relaxed);
+        }
+
+        void applyReducedQuality() override {
+            const bool reduced = reducedQuality.load(std::memory_order_relaxed);
+            if (reduced == appliedReducedQuality) return;
+            appliedReducedQuality = reduced;
+            synth.setOutputGen(reduced ? reducedOutput : fullOutput);
+        }
     
     private:
         void configureSynth(const std::string& waveform, float attack, float decay, float sustain, float release, float baseFilterFreq, float filterQ) {
@@ -81,14 +165,21 @@ class TonicSimpleADSRFilterSynth : public SynthWrapper {
     
             filterFreq = voiceFreq * 0.5 + baseFilterFreq;
             filter = Tonic::LPF24().Q(filterQ).cutoff(filterFreq);
-    
-            synth.setOutputGen((tone * env) >> filter);
+            reducedFilter = Tonic::LPF12().Q(filterQ).cutoff(filterFreq);
+
+            fullOutput = (tone * env) >> filter;
+            reducedOutput = (tone * env) >> reducedFilter;
+            synth.setOutputGen(fullOutput);
         }
     
         Tonic::ControlGenerator voiceFreq, filterFreq;
-        Tonic::Generator tone;
+        Tonic::Generator tone, fullOutput, reducedOutput;
         Tonic::ADSR env;
         Tonic::LPF24 filter;
+        Tonic::LPF12 reducedFilter;
+        float release;
+        std::atomic<bool> reducedQuality;
+        bool appliedReducedQuality;  // Only touched by the audio thread
     };
 
 class ControlParameters {
@@ -117,6 +208,10 @@ public:
         synths[name] = synth;
     }
 
+    void unregisterSynth(const std::string& name) {
+        synths.erase(name);
+    }
+
 private:
     std::unordered_map<std::string, std::vector<std::pair<std::string, std::string>>> linkedParameters; // controlParameterName -> list of (synthName, synthParameterName)
     std::unordered_map<std::string, std::shared_ptr<SynthWrapper>> synths;                              // synthName -> synth instance
@@ -124,9 +219,1055 @@ private:
 
 
 
+// Lock-free ring buffer for exactly one producer thread and one consumer thread
+template <typename T>
+class SpscRingBuffer {
+public:
+    explicit SpscRingBuffer(size_t capacity) : buffer(capacity + 1), readIndex(0), writeIndex(0) {}
+
+    // Producer side: copies as many items as fit and returns how many were written
+    size_t write(const T* data, size_t count) {
+        const size_t write = writeIndex.load(std::memory_order_relaxed);
+        const size_t read = readIndex.load(std::memory_order_acquire);
+        const size_t size = buffer.size();
+        const size_t freeItems = (read + size - write - 1) % size;
+        const size_t n = std::min(count, freeItems);
+
+        const size_t first = std::min(n, size - write);
+        std::copy(data, data + first, buffer.begin() + write);
+        std::copy(data + first, data + n, buffer.begin());
+
+        writeIndex.store((write + n) % size, std::memory_order_release);
+        return n;
+    }
+
+    // Consumer side: copies up to count items and returns how many were read
+    size_t read(T* data, size_t count) {
+        const size_t read = readIndex.load(std::memory_order_relaxed);
+        const size_t write = writeIndex.load(std::memory_order_acquire);
+        const size_t size = buffer.size();
+        const size_t n = std::min(count, (write + size - read) % size);
+
+        const size_t first = std::min(n, size - read);
+        std::copy(buffer.begin() + read, buffer.begin() + read + first, data);
+        std::copy(buffer.begin(), buffer.begin() + (n - first), data + first);
+
+        readIndex.store((read + n) % size, std::memory_order_release);
+        return n;
+    }
+
+    // Consumer side: drops everything that has been written so far
+    void discard() {
+        readIndex.store(writeIndex.load(std::memory_order_acquire), std::memory_order_release);
+    }
+
+    size_t available() const {
+        const size_t size = buffer.size();
+        return (writeIndex.load(std::memory_order_acquire) + size - readIndex.load(std::memory_order_acquire)) % size;
+    }
+
+    size_t capacity() const {
+        return buffer.size() - 1;
+    }
+
+private:
+    std::vector<T> buffer;
+    std::atomic<size_t> readIndex, writeIndex;
+};
+
+// Keeps the copy-on-write lists replaced by a writer alive until the audio thread is done with
+// them. The lists are shared with std::atomic_load and std::atomic_store, which are atomic but
+// not lock-free: libstdc++ guards them with a global pool of mutexes, so the audio thread may
+// briefly wait for a writer that is swapping a list. A replaced list can no longer be loaded,
+// so once the retirer holds its only reference it is freed here, on the writer's thread,
+// together with the synths, sessions or effects in it. The audio thread therefore never
+// releases the last reference to any of them.
+class SnapshotRetirer {
+public:
+    void retire(std::shared_ptr<const void> snapshot) {
+        std::lock_guard<std::mutex> lock(mutex);
+        retired.erase(std::remove_if(retired.begin(), retired.end(),
+                                     [](const std::shared_ptr<const void>& entry) { return entry.use_count() == 1; }),
+                      retired.end());
+        retired.push_back(std::move(snapshot));
+    }
+
+private:
+    std::mutex mutex;
+    std::vector<std::shared_ptr<const void>> retired;
+};
+
+// Records the engine output to a WAV file without doing any I/O on the audio thread.
+// The audio callback only copies into a preallocated ring, a writer thread drains it to disk.
+class AudioRecorder {
+public:
+    AudioRecorder() : ring(SAMPLE_RATE * RECORDER_RING_SECONDS), recording(false),
+                      framesWritten(0), overrunFrames(0), overrunBlocks(0), maxFill(0) {}
+
+    ~AudioRecorder() {
+        stop();
+    }
+
+    void start(const std::string& filename) {
+        if (recording) {
+            throw std::runtime_error("A recording is already running");
+        }
+
+        file.open(filename, std::ios::binary | std::ios::trunc);
+        if (!file) {
+            throw std::runtime_error("Could not open recording file '" + filename + "'");
+        }
+        writeWavHeader(0);
+
+        ring.discard();
+        framesWritten = 0;
+        overrunFrames = 0;
+        overrunBlocks = 0;
+        maxFill = 0;
+
+        recording.store(true, std::memory_order_release);
+        writerThread = std::thread(&AudioRecorder::writerLoop, this);
+    }
+
+    void stop() {
+        if (!recording) return;
+
+        recording.store(false, std::memory_order_release);
+        writerThread.join();
+
+        file.seekp(0);
+        writeWavHeader(framesWritten);
+        file.close();
+    }
+
+    // Called from the audio thread
+    void push(const float* buffer, unsigned int nFrames) {
+        if (!recording.load(std::memory_order_acquire)) return;
+
+        size_t written = ring.write(buffer, nFrames);
+        if (written < nFrames) {
+            overrunFrames.fetch_add(nFrames - written, std::memory_order_relaxed);
+            overrunBlocks.fetch_add(1, std::memory_order_relaxed);
+        }
+
+        size_t fill = ring.available();
+        if (fill > maxFill.load(std::memory_order_relaxed)) {
+            maxFill.store(fill, std::memory_order_relaxed);
+        }
+    }
+
+    pybind11::dict getStats() const {
+        pybind11::dict stats;
+        stats["recording"] = recording.load();
+        stats["frames_written"] = framesWritten.load();
+        stats["overrun_frames"] = overrunFrames.load();
+        stats["overrun_blocks"] = overrunBlocks.load();
+        stats["max_fill"] = maxFill.load();
+        stats["capacity"] = ring.capacity();
+        return stats;
+    }
+
+private:
+    void writerLoop() {
+        std::vector<float> chunk(RECORDER_WRITE_FRAMES);
+
+        while (true) {
+            bool stopping = !recording.load(std::memory_order_acquire);
+
+            // Only write in large sequential chunks unless the recording is being finished
+            if (!stopping && ring.available() < chunk.size()) {
+                std::this_thread::sleep_for(std::chrono::milliseconds(10));
+                continue;
+            }
+
+            size_t n = ring.read(chunk.data(), chunk.size());
+            if (n > 0) {
+                file.write(reinterpret_cast<const char*>(chunk.data()), n * sizeof(float));
+                framesWritten += n;
+            }
+            if (stopping && ring.available() == 0) break;
+        }
+    }
+
+    // A WAV header with a JUNK chunk reserving the space of a ds64 chunk. Recordings past 4 GiB
+    // (about 6 hours) are turned into RF64 files by writing the 64 bit sizes into that chunk.
+    void writeWavHeader(uint64_t numFrames) {
+        const uint16_t channels = 1;
+        const uint16_t bitsPerSample = 32;
+        const uint16_t formatIeeeFloat = 3;
+        const uint32_t sampleRate = SAMPLE_RATE;
+        const uint32_t byteRate = sampleRate * channels * bitsPerSample / 8;
+        const uint16_t blockAlign = channels * bitsPerSample / 8;
+        const uint64_t dataSize = numFrames * blockAlign;
+        const uint64_t riffSize = 72 + dataSize;
+        const uint32_t fmtSize = 16;
+        const uint32_t ds64Size = 28;
+        const bool rf64 = riffSize > UINT32_MAX;
+
+        file.write(rf64 ? "RF64" : "RIFF", 4);
+        writeValue(rf64 ? UINT32_MAX : static_cast<uint32_t>(riffSize));
+        file.write("WAVE", 4);
+        file.write(rf64 ? "ds64" : "JUNK", 4);
+        writeValue(ds64Size);
+        writeValue(rf64 ? riffSize : uint64_t(0));
+        writeValue(rf64 ? dataSize : uint64_t(0));
+        writeValue(rf64 ? numFrames : uint64_t(0));
+        writeValue(uint32_t(0));  // No table of other chunk sizes
+        file.write("fmt ", 4);
+        writeValue(fmtSize);
+        writeValue(formatIeeeFloat);
+        writeValue(channels);
+        writeValue(sampleRate);
+        writeValue(byteRate);
+        writeValue(blockAlign);
+        writeValue(bitsPerSample);
+        file.write("data", 4);
+        writeValue(rf64 ? UINT32_MAX : static_cast<uint32_t>(dataSize));
+    }
+
+    template <typename T>
+    void writeValue(T value) {
+        file.write(reinterpret_cast<const char*>(&value), sizeof(T));  // WAV is little endian, as are our targets
+    }
+
+    SpscRingBuffer<float> ring;
+    std::ofstream file;
+    std::thread writerThread;
+    std::atomic<bool> recording;
+    std::atomic<uint64_t> framesWritten;
+    std::atomic<uint64_t> overrunFrames, overrunBlocks;
+    std::atomic<size_t> maxFill;
+};
+
+// A fixed pattern of notes for the StepSequencer. Notes are added from Python and the pattern is
+// frozen once it is handed to a sequencer. Pitch and amplitude of a note stay writable, so Python
+// can refill dynamic notes while the pattern plays.
+class StepPattern {
+public:
+    StepPattern(unsigned int numSteps, unsigned int repetitions)
+        : id(nextId++), numSteps(numSteps), repetitions(repetitions), frozen(false) {
+        if (numSteps == 0) {
+            throw std::invalid_argument("A step pattern needs at least one step");
+        }
+    }
+
+    size_t addNote(unsigned int step, std::shared_ptr<SynthWrapper> synth, int pitch, float amplitude,
+                   unsigned int length, bool dynamic) {
+        if (frozen) {
+            throw std::runtime_error("Cannot add notes to a pattern that has been handed to a sequencer");
+        }
+        if (step >= numSteps) {
+            throw std::invalid_argument("Step " + std::to_string(step) + " is outside of the pattern");
+        }
+        notes.emplace_back(step, std::move(synth), pitch, amplitude, std::max(length, 1u), dynamic);
+        return notes.size() - 1;
+    }
+
+    void setNote(size_t index, int pitch, float amplitude) {
+        Note& note = notes.at(index);
+        note.pitch.store(pitch, std::memory_order_relaxed);
+        note.amplitude.store(amplitude, std::memory_order_relaxed);
+    }
+
+    // Sorts the notes by step, called on the Python thread before the pattern reaches the audio thread
+    void freeze() {
+        if (frozen) return;
+        noteOrder.resize(notes.size());
+        for (size_t i = 0; i < notes.size(); ++i) {
+            noteOrder[i] = i;
+        }
+        std::stable_sort(noteOrder.begin(), noteOrder.end(),
+                         [this](size_t a, size_t b) { return notes[a].step < notes[b].step; });
+        stepStarts.assign(numSteps + 1, 0);
+        for (const auto& note : notes) {
+            ++stepStarts[note.step + 1];
+        }
+        for (unsigned int step = 0; step < numSteps; ++step) {
+            stepStarts[step + 1] += stepStarts[step];
+        }
+        frozen = true;
+    }
+
+    uint32_t getId() const { return id; }
+    unsigned int getNumSteps() const { return numSteps; }
+    unsigned int getRepetitions() const { return repetitions; }
+    size_t getNoteCount() const { return notes.size(); }
+
+private:
+    friend class StepSequencer;
+
+    struct Note {
+        Note(unsigned int step, std::shared_ptr<SynthWrapper> synth, int pitch, float amplitude, unsigned int length, bool dynamic)
+            : step(step), synth(std::move(synth)), pitch(pitch), amplitude(amplitude), length(length), dynamic(dynamic) {}
+
+        unsigned int step;
+        std::shared_ptr<SynthWrapper> synth;
+        std::atomic<int> pitch;
+        std::atomic<float> amplitude;
+        unsigned int length;
+        bool dynamic;
+    };
+
+    static std::atomic<uint32_t> nextId;
+
+    uint32_t id;
+    unsigned int numSteps;
+    unsigned int repetitions;  // 0 repeats the pattern until the sequencer is stopped
+    std::atomic<bool> frozen;
+    std::deque<Note> notes;           // A deque, as the atomics cannot be moved
+    std::vector<size_t> noteOrder;    // Note indices sorted by step
+    std::vector<size_t> stepStarts;   // The notes of step s are noteOrder[stepStarts[s]] to noteOrder[stepStarts[s + 1]]
+};
+
+std::atomic<uint32_t> StepPattern::nextId(1);
+
+struct SequencerEvent {
+    enum Type { NOTE_ON = 0, NOTE_OFF = 1, DYNAMIC_NOTE = 2, PATTERN_STARTED = 3, PART_ENDING = 4, STOPPED = 5 };
+
+    int type;
+    uint32_t patternId;
+    uint64_t step;   // The song subdivision the event happened on
+    int32_t note;    // Index of the note in its pattern, -1 for pattern events
+    int32_t pitch;
+    float amplitude;
+};
+
+// Plays step patterns on the audio thread. Each session renders its synths in slices that end
+// where the next step is due, so notes start on the exact frame of their step (Tonic applies
+// parameter changes once per 64 frame synthesis block, which bounds the accuracy in practice).
+//
+// Python only hears back through a lock-free event queue: when a dynamic note was played and
+// needs a new value, when a pattern starts, and when its last repetition starts. The last
+// repetition leaves Python the time to queue the next pattern or finish, so part transitions
+// between patterns are seamless.
+//
+// Steps are counted in song subdivisions and timed by a copy of the song's tempo map, so patterns
+// follow tempo changes and ramps like the playback loop does.
+class StepSequencer {
+public:
+    StepSequencer()
+        : events(SEQUENCER_EVENT_QUEUE), tempo(std::make_shared<const TempoList>()), running(false),
+          finishRequested(false), stopRequested(false), reportNotes(false), droppedEvents(0),
+          pattern(nullptr), frame(0), nextStepFrame(0.0), step(0), position(0), repetition(0) {
+        activeNotes.reserve(SEQUENCER_MAX_ACTIVE_NOTES);
+    }
+
+    // Sets the tempo as (first step, step duration in seconds) pairs, each duration holds until the next change
+    void setTempo(const std::vector<std::pair<uint64_t, double>>& changes) {
+        auto updated = std::make_shared<TempoList>();
+        updated->reserve(changes.size());
+        for (const auto& change : changes) {
+            if (!(change.second > 0.0)) {
+                throw std::invalid_argument("The step duration has to be positive");
+            }
+            updated->emplace_back(change.first, change.second * SAMPLE_RATE);
+        }
+        std::sort(updated->begin(), updated->end());
+        retirer.retire(std::atomic_exchange(&tempo, std::shared_ptr<const TempoList>(updated)));
+    }
+
+    // Starts a pattern at the next block, `firstStep` is the song subdivision of its first step
+    void start(std::shared_ptr<StepPattern> pattern, uint64_t firstStep) {
+        if (std::atomic_load(&tempo)->empty()) {
+            throw std::runtime_error("Set the tempo with setTempo before starting a pattern");
+        }
+        pattern->freeze();
+        std::atomic_store(&queuedPattern, std::shared_ptr<const PatternRequest>());
+        finishRequested.store(false, std::memory_order_relaxed);
+        std::atomic_store(&startRequest, makeRequest(std::move(pattern), firstStep));
+    }
+
+    // Plays a pattern once the repetitions of the current one are done
+    void queuePattern(std::shared_ptr<StepPattern> pattern) {
+        pattern->freeze();
+        finishRequested.store(false, std::memory_order_relaxed);
+        std::atomic_store(&queuedPattern, makeRequest(std::move(pattern), 0));
+    }
+
+    // Stops once the repetitions of the current pattern are done, playing notes are released on time
+    void finish() {
+        std::atomic_store(&queuedPattern, std::shared_ptr<const PatternRequest>());
+        finishRequested.store(true, std::memory_order_relaxed);
+    }
+
+    // Stops at the next block and releases all playing notes
+    void stop() {
+        stopRequested.store(true, std::memory_order_release);
+    }
+
+    bool isRunning() const {
+        return running.load(std::memory_order_acquire);
+    }
+
+    // Note events are only needed for MIDI recording, so they are opt-in
+    void setReportNotes(bool enabled) {
+        reportNotes.store(enabled, std::memory_order_relaxed);
+    }
+
+    uint64_t getDroppedEvents() const {
+        return droppedEvents.load(std::memory_order_relaxed);
+    }
+
+    pybind11::list pollEvents() {
+        static const char* typeNames[] = {"note_on", "note_off", "dynamic_note", "pattern_started", "part_ending", "stopped"};
+
+        pybind11::list result;
+        SequencerEvent event;
+        while (events.read(&event, 1) == 1) {
+            pybind11::dict entry;
+            entry["type"] = typeNames[event.type];
+            entry["pattern"] = event.patternId;
+            entry["step"] = event.step;
+            entry["note"] = event.note;
+            entry["pitch"] = event.pitch;
+            entry["amplitude"] = event.amplitude;
+            result.append(entry);
+        }
+        return result;
+    }
+
+    // Called from the audio thread: plays the steps due at the current frame and returns the number
+    // of frames, at most maxFrames, that can be rendered before the next step is due
+    unsigned int process(unsigned int maxFrames) {
+        handleRequests();
+        if (!running.load(std::memory_order_relaxed)) return maxFrames;
+
+        auto currentTempo = std::atomic_load(&tempo);
+        while (static_cast<double>(frame) >= nextStepFrame) {
+            playStep(*currentTempo);
+            if (!running.load(std::memory_order_relaxed)) return maxFrames;
+        }
+
+        const double framesUntilStep = std::ceil(nextStepFrame) - static_cast<double>(frame);
+        const unsigned int n = static_cast<unsigned int>(std::min<double>(maxFrames, std::max(1.0, framesUntilStep)));
+        frame += n;
+        return n;
+    }
+
+private:
+    using TempoList = std::vector<std::pair<uint64_t, double>>;  // (first step, step duration in frames)
+
+    struct PatternRequest {
+        std::shared_ptr<StepPattern> pattern;
+        uint64_t firstStep;
+    };
+
+    struct ActiveNote {
+        std::shared_ptr<const PatternRequest> request;  // Keeps the pattern and its synth alive, see makeRequest
+        SynthWrapper* synth;
+        uint32_t patternId;
+        int32_t note;
+        int32_t pitch;
+        uint64_t endStep;
+    };
+
+    // The audio thread drops the requests it has played, which may hold the last reference to their
+    // pattern, so each request is retired and freed on a Python thread once the audio thread is done
+    std::shared_ptr<const PatternRequest> makeRequest(std::shared_ptr<StepPattern> pattern, uint64_t firstStep) {
+        auto request = std::make_shared<const PatternRequest>(PatternRequest{std::move(pattern), firstStep});
+        retirer.retire(request);
+        return request;
+    }
+
+    // The duration in frames of a step, set by the last tempo change at or before it
+    static double getStepFrames(const TempoList& currentTempo, uint64_t atStep) {
+        auto next = std::upper_bound(currentTempo.begin(), currentTempo.end(), atStep,
+                                     [](uint64_t value, const TempoList::value_type& change) { return value < change.first; });
+        return next == currentTempo.begin() ? currentTempo.front().second : std::prev(next)->second;
+    }
+
+    void handleRequests() {
+        if (stopRequested.exchange(false, std::memory_order_acquire)) {
+            for (auto& active : activeNotes) {
+                active.synth->stopNote();
+                postNoteOff(active);
+            }
+            activeNotes.clear();
+            if (pattern) {
+                post({SequencerEvent::STOPPED, pattern->getId(), step, -1, 0, 0.0f});
+            }
+            playing.reset();
+            pattern = nullptr;
+            running.store(false, std::memory_order_release);
+        }
+
+        if (std::atomic_load(&startRequest)) {
+            auto request = std::atomic_exchange(&startRequest, std::shared_ptr<const PatternRequest>());
+            step = request->firstStep;
+            frame = 0;
+            nextStepFrame = 0.0;
+            beginPattern(std::move(request));
+            running.store(true, std::memory_order_release);
+        }
+    }
+
+    void beginPattern(std::shared_ptr<const PatternRequest> request) {
+        playing = std::move(request);
+        pattern = playing->pattern.get();
+        position = 0;
+        repetition = 0;
+    }
+
+    void playStep(const TempoList& currentTempo) {
+        // Release notes before starting new ones, like the playback loop does
+        for (size_t i = 0; i < activeNotes.size();) {
+            if (activeNotes[i].endStep <= step) {
+                activeNotes[i].synth->stopNote();
+                postNoteOff(activeNotes[i]);
+                activeNotes[i] = std::move(activeNotes.back());
+                activeNotes.pop_back();
+            } else {
+                ++i;
+            }
+        }
+
+        if (!pattern) {
+            // Finished, only counting steps until the last notes are released
+            if (activeNotes.empty()) {
+                running.store(false, std::memory_order_release);
+                return;
+            }
+        } else {
+            if (position == 0) {
+                if (repetition == 0) {
+                    post({SequencerEvent::PATTERN_STARTED, pattern->getId(), step, -1, 0, 0.0f});
+                }
+                if (repetition + 1 == pattern->getRepetitions()) {
+                    post({SequencerEvent::PART_ENDING, pattern->getId(), step, -1, 0, 0.0f});
+                }
+            }
+
+            const bool notes = reportNotes.load(std::memory_order_relaxed);
+            for (size_t i = pattern->stepStarts[position]; i < pattern->stepStarts[position + 1]; ++i) {
+                const size_t index = pattern->noteOrder[i];
+                StepPattern::Note& note = pattern->notes[index];
+                const int pitch = note.pitch.load(std::memory_order_relaxed);
+                const float amplitude = note.amplitude.load(std::memory_order_relaxed);
+
+                note.synth->startNote(pitch, amplitude);
+                if (activeNotes.size() < activeNotes.capacity()) {  // Never allocate on the audio thread
+                    activeNotes.push_back({playing, note.synth.get(), pattern->getId(), static_cast<int32_t>(index), pitch,
+                                           step + note.length});
+                }
+                if (notes) {
+                    post({SequencerEvent::NOTE_ON, pattern->getId(), step, static_cast<int32_t>(index), pitch, amplitude});
+                }
+                if (note.dynamic) {
+                    post({SequencerEvent::DYNAMIC_NOTE, pattern->getId(), step, static_cast<int32_t>(index), pitch, amplitude});
+                }
+            }
+
+            if (++position == pattern->getNumSteps()) {
+                position = 0;
+                if (++repetition == pattern->getRepetitions()) {
+                    endPattern();
+                }
+            }
+        }
+
+        nextStepFrame += getStepFrames(currentTempo, step);
+        ++step;
+    }
+
+    // Switches to the queued pattern, finishes, or repeats the current pattern if Python did not decide in time
+    void endPattern() {
+        if (std::atomic_load(&queuedPattern)) {
+            beginPattern(std::atomic_exchange(&queuedPattern, std::shared_ptr<const PatternRequest>()));
+        } else if (finishRequested.exchange(false, std::memory_order_relaxed)) {
+            post({SequencerEvent::STOPPED, pattern->getId(), step + 1, -1, 0, 0.0f});
+            playing.reset();
+            pattern = nullptr;
+        } else {
+            repetition = 0;
+        }
+    }
+
+    void postNoteOff(const ActiveNote& active) {
+        if (reportNotes.load(std::memory_order_relaxed)) {
+            post({SequencerEvent::NOTE_OFF, active.patternId, step, active.note, active.pitch, 0.0f});
+        }
+    }
+
+    void post(const SequencerEvent& event) {
+        if (events.write(&event, 1) == 0) {
+            droppedEvents.fetch_add(1, std::memory_order_relaxed);
+        }
+    }
+
+    SpscRingBuffer<SequencerEvent> events;
+    std::shared_ptr<const PatternRequest> startRequest, queuedPattern;  // Handed to the audio thread with atomic_exchange
+    std::shared_ptr<const TempoList> tempo;  // Copy on write, read by the audio thread, see SnapshotRetirer
+    SnapshotRetirer retirer;  // Holds the replaced tempo lists and the pattern requests, see makeRequest
+    std::atomic<bool> running, finishRequested, stopRequested, reportNotes;
+    std::atomic<uint64_t> droppedEvents;
+
+    // Only touched by the audio thread
+    std::shared_ptr<const PatternRequest> playing;  // Retired, so dropping it never frees the pattern here
+    StepPattern* pattern;  // The pattern of `playing`, nullptr once finished
+    std::vector<ActiveNote> activeNotes;
+    uint64_t frame;
+    double nextStepFrame;
+    uint64_t step;
+    unsigned int position, repetition;
+};
+
+// An effect on a shared bus of the engine. The synths feed the bus with their send levels and the
+// effect runs once per block on the sum, however many synths are sent to it.
+class Effect {
+public:
+    Effect() : returnGain(1.0f) {}
+    virtual ~Effect() = default;
+
+    // Called from the audio thread: turns the send signal of the bus into the wet signal, in place
+    virtual void process(float* buffer, unsigned int nFrames) = 0;
+
+    void setReturnGain(float value) {
+        returnGain.store(value, std::memory_order_relaxed);
+    }
+
+    float getReturnGain() const {
+        return returnGain.load(std::memory_order_relaxed);
+    }
+
+private:
+    std::atomic<float> returnGain;
+};
+
+using EffectBusList = std::array<std::shared_ptr<Effect>, MAX_EFFECT_BUSES>;
+
+// Zeroes the tiny values a decaying feedback loop leaves once its input is silent. Denormal floats
+// are many times slower to compute with on most CPUs and would make an idle effect bus expensive.
+inline float flushDenormal(float value) {
+    return std::fabs(value) < 1.0e-15f ? 0.0f : value;
+}
+
+// A feedback delay with a low pass in the feedback path, so the repeats get darker
+class DelayEffect : public Effect {
+public:
+    DelayEffect(float delaySeconds, float feedback, float damping)
+        : line(std::max<size_t>(1, static_cast<size_t>(delaySeconds * SAMPLE_RATE))), index(0), lowPass(0.0f),
+          feedback(0.0f), damping(0.0f) {
+        setFeedback(feedback);
+        setDamping(damping);
+    }
+
+    void process(float* buffer, unsigned int nFrames) override {
+        const float currentFeedback = feedback.load(std::memory_order_relaxed);
+        const float currentDamping = damping.load(std::memory_order_relaxed);
+        for (unsigned int i = 0; i < nFrames; ++i) {
+            const float delayed = line[index];
+            lowPass = flushDenormal(delayed * (1.0f - currentDamping) + lowPass * currentDamping);
+            line[index] = flushDenormal(buffer[i] + lowPass * currentFeedback);
+            buffer[i] = delayed;
+            if (++index == line.size()) index = 0;
+        }
+    }
+
+    // Kept below 1, so the repeats always die out
+    void setFeedback(float value) {
+        feedback.store(std::min(std::max(value, 0.0f), 0.99f), std::memory_order_relaxed);
+    }
+
+    void setDamping(float value) {
+        damping.store(std::min(std::max(value, 0.0f), 1.0f), std::memory_order_relaxed);
+    }
+
+private:
+    std::vector<float> line;
+    size_t index;
+    float lowPass;
+    std::atomic<float> feedback, damping;
+};
+
+// A small Freeverb: parallel damped comb filters followed by serial allpass filters
+class ReverbEffect : public Effect {
+public:
+    ReverbEffect(float roomSize, float damping) : roomSize(0.0f), damping(0.0f) {
+        setRoomSize(roomSize);
+        setDamping(damping);
+        // The Freeverb delay lengths are tuned for 44.1 kHz
+        const double scale = SAMPLE_RATE / 44100.0;
+        for (size_t i = 0; i < combs.size(); ++i) {
+            combs[i].buffer.assign(static_cast<size_t>(combLengths[i] * scale), 0.0f);
+        }
+        for (size_t i = 0; i < allpasses.size(); ++i) {
+            allpasses[i].buffer.assign(static_cast<size_t>(allpassLengths[i] * scale), 0.0f);
+        }
+    }
+
+    void process(float* buffer, unsigned int nFrames) override {
+        const float feedback = 0.7f + 0.28f * roomSize.load(std::memory_order_relaxed);
+        const float damp = 0.4f * damping.load(std::memory_order_relaxed);
+        for (unsigned int i = 0; i < nFrames; ++i) {
+            const float input = buffer[i] * 0.015f;  // Freeverb's fixed input gain keeps the combs from clipping
+            float output = 0.0f;
+            for (auto& comb : combs) {
+                const float delayed = comb.buffer[comb.index];
+                comb.store = flushDenormal(delayed * (1.0f - damp) + comb.store * damp);
+                comb.buffer[comb.index] = flushDenormal(input + comb.store * feedback);
+                if (++comb.index == comb.buffer.size()) comb.index = 0;
+                output += delayed;
+            }
+            for (auto& allpass : allpasses) {
+                const float delayed = allpass.buffer[allpass.index];
+                allpass.buffer[allpass.index] = flushDenormal(output + delayed * 0.5f);
+                if (++allpass.index == allpass.buffer.size()) allpass.index = 0;
+                output = delayed - output;
+            }
+            buffer[i] = output;
+        }
+    }
+
+    // Clamped to [0, 1], which keeps the comb feedback at most 0.98
+    void setRoomSize(float value) {
+        roomSize.store(std::min(std::max(value, 0.0f), 1.0f), std::memory_order_relaxed);
+    }
+
+    void setDamping(float value) {
+        damping.store(std::min(std::max(value, 0.0f), 1.0f), std::memory_order_relaxed);
+    }
+
+private:
+    struct DelayLine {
+        std::vector<float> buffer;
+        size_t index = 0;
+        float store = 0.0f;
+    };
+
+    static constexpr int combLengths[4] = {1116, 1188, 1277, 1356};
+    static constexpr int allpassLengths[2] = {556, 441};
+
+    std::array<DelayLine, 4> combs;
+    std::array<DelayLine, 2> allpasses;
+    std::atomic<float> roomSize, damping;
+};
+
+constexpr int ReverbEffect::combLengths[4];
+constexpr int ReverbEffect::allpassLengths[2];
+
+// A resonant biquad low pass
+class FilterEffect : public Effect {
+public:
+    FilterEffect(float cutoff, float q) : cutoff(0.0f), q(0.0f), appliedCutoff(0.0f), appliedQ(0.0f),
+                                          x1(0.0f), x2(0.0f), y1(0.0f), y2(0.0f) {
+        setCutoff(cutoff);
+        setQ(q);
+    }
+
+    void process(float* buffer, unsigned int nFrames) override {
+        updateCoefficients();
+        for (unsigned int i = 0; i < nFrames; ++i) {
+            const float x = buffer[i];
+            const float y = flushDenormal(b0 * x + b1 * x1 + b2 * x2 - a1 * y1 - a2 * y2);
+            x2 = x1;
+            x1 = x;
+            y2 = y1;
+            y1 = y;
+            buffer[i] = y;
+        }
+    }
+
+    // Clamped to [10 Hz, 0.49 * SAMPLE_RATE], a cutoff of 0 or at Nyquist makes the filter unstable
+    void setCutoff(float value) {
+        cutoff.store(std::min(std::max(value, 10.0f), 0.49f * SAMPLE_RATE), std::memory_order_relaxed);
+    }
+
+    void setQ(float value) {
+        q.store(std::max(value, 0.01f), std::memory_order_relaxed);
+    }
+
+private:
+    // Coefficients from the Audio EQ Cookbook, only recomputed when a parameter changed
+    void updateCoefficients() {
+        const float currentCutoff = cutoff.load(std::memory_order_relaxed);
+        const float currentQ = q.load(std::memory_order_relaxed);
+        if (currentCutoff == appliedCutoff && currentQ == appliedQ) return;
+        appliedCutoff = currentCutoff;
+        appliedQ = currentQ;
+
+        const float omega = 6.2831853f * currentCutoff / SAMPLE_RATE;
+        const float alpha = std::sin(omega) / (2.0f * currentQ);
+        const float cosOmega = std::cos(omega);
+        const float a0 = 1.0f + alpha;
+        b0 = (1.0f - cosOmega) / 2.0f / a0;
+        b1 = (1.0f - cosOmega) / a0;
+        b2 = b0;
+        a1 = -2.0f * cosOmega / a0;
+        a2 = (1.0f - alpha) / a0;
+    }
+
+    std::atomic<float> cutoff, q;
+    float appliedCutoff, appliedQ;
+    float b0 = 0.0f, b1 = 0.0f, b2 = 0.0f, a1 = 0.0f, a2 = 0.0f;
+    float x1, x2, y1, y2;
+};
+
+// A group of synths with its own bus, gain and control parameters. Several sessions share one
+// AudioEngine and are mixed in the same audio callback.
+class AudioSession {
+public:
+    AudioSession(const std::string& name, std::shared_ptr<ControlParameters> controlParams)
+        : name(name), controlParams(std::move(controlParams)), gain(1.0f), synths(std::make_shared<const SynthList>()) {}
+
+    void registerSynth(const std::string& synthName, std::shared_ptr<SynthWrapper> synth) {
+        std::lock_guard<std::mutex> lock(writeMutex);
+        auto updated = std::make_shared<SynthList>(*std::atomic_load(&synths));
+        // Recycled synths may still be degraded from an earlier overload, the load shedder degrades them again if needed.
+        // Both only store atomics, the audio thread switches the graph back before rendering the synth.
+        synth->setMuted(false);
+        synth->setReducedQuality(false);
+        updated->emplace_back(synthName, synth);
+        retirer.retire(std::atomic_exchange(&synths, std::shared_ptr<const SynthList>(updated)));
+        controlParams->registerSynth(synthName, synth);
+    }
+
+    void unregisterSynth(const std::string& synthName) {
+        std::lock_guard<std::mutex> lock(writeMutex);
+        auto updated = std::make_shared<SynthList>(*std::atomic_load(&synths));
+        updated->erase(std::remove_if(updated->begin(), updated->end(),
+                                      [&synthName](const SynthList::value_type& entry) { return entry.first == synthName; }),
+                       updated->end());
+        retirer.retire(std::atomic_exchange(&synths, std::shared_ptr<const SynthList>(updated)));
+        controlParams->unregisterSynth(synthName);
+    }
+
+    void setGain(float value) {
+        gain.store(value, std::memory_order_relaxed);
+    }
+
+    float getGain() const {
+        return gain.load(std::memory_order_relaxed);
+    }
+
+    const std::string& getName() const {
+        return name;
+    }
+
+    size_t getSynthCount() const {
+        return std::atomic_load(&synths)->size();
+    }
+
+    template <typename Function>
+    void forEachSynth(Function function) const {
+        for (const auto& entry : *std::atomic_load(&synths)) {
+            function(*entry.second);
+        }
+    }
+
+    StepSequencer& getSequencer() {
+        return sequencer;
+    }
+
+    // Called from the audio thread: renders all synths into the bus and adds it to the output. The
+    // synths also feed the shared effect buses, `sends` holds BUFFER_SIZE frames per bus.
+    void process(float* output, float* bus, float* scratch, float* sends, const EffectBusList& effects, unsigned int nFrames) {
+        auto currentSynths = std::atomic_load(&synths);
+        if (currentSynths->empty()) return;
+
+        for (const auto& entry : *currentSynths) {
+            entry.second->applyReducedQuality();
+        }
+
+        const float busGain = gain.load(std::memory_order_relaxed);
+        std::fill(bus, bus + nFrames, 0.0f);
+        for (unsigned int offset = 0; offset < nFrames;) {
+            // Render up to the frame where the next step of the sequencer is due
+            const unsigned int slice = sequencer.process(nFrames - offset);
+            for (const auto& entry : *currentSynths) {
+                if (entry.second->isMuted()) continue;
+                entry.second->getSynth().fillBufferOfFloats(scratch, slice, 1);
+                for (unsigned int i = 0; i < slice; ++i) {
+                    bus[offset + i] += scratch[i];
+                }
+
+                for (unsigned int effectBus = 0; effectBus < MAX_EFFECT_BUSES; ++effectBus) {
+                    const float level = entry.second->getSend(effectBus) * busGain;
+                    if (!effects[effectBus] || level == 0.0f) continue;
+                    float* send = sends + effectBus * BUFFER_SIZE + offset;
+                    for (unsigned int i = 0; i < slice; ++i) {
+                        send[i] += scratch[i] * level;
+                    }
+                }
+            }
+            offset += slice;
+        }
+
+        for (unsigned int i = 0; i < nFrames; ++i) {
+            output[i] += bus[i] * busGain;
+        }
+    }
+
+private:
+    using SynthList = std::vector<std::pair<std::string, std::shared_ptr<SynthWrapper>>>;
+
+    std::string name;
+    std::shared_ptr<ControlParameters> controlParams;  // Shared, as the engine may keep the session after Python dropped it
+    std::atomic<float> gain;
+    std::shared_ptr<const SynthList> synths;  // Copy on write, read by the audio thread, see SnapshotRetirer
+    std::mutex writeMutex;
+    SnapshotRetirer retirer;
+    StepSequencer sequencer;
+};
+
+using SessionList = std::vector<std::shared_ptr<AudioSession>>;
+
+// Load shedding is opt-in, so songs render the same unless configureLoadShedding is called
+struct LoadSheddingConfig {
+    bool enabled = false;
+    double highLoad = 0.8;            // Load above which a block counts as overloaded
+    double lowLoad = 0.5;             // Load below which a block counts as relaxed
+    unsigned int escalateBlocks = 8;  // Consecutive overloaded blocks before degrading one more level
+    unsigned int restoreBlocks = 200; // Consecutive relaxed blocks before restoring one level
+    unsigned int maxSynths = 8;       // Number of synths kept rendering from level CAPPED_SYNTHS on
+    int mutePriority = 0;             // Synths below this priority are muted at level MUTED_LOW_PRIORITY
+};
+
+// Degrades the rendering step by step while the audio callback runs close to its deadline
+// and restores it once the load drops. Runs on the audio thread.
+class LoadShedder {
+public:
+    enum Level { NONE = 0, REDUCED_FILTERS = 1, CAPPED_SYNTHS = 2, MUTED_LOW_PRIORITY = 3 };
+
+    LoadShedder() : config(std::make_shared<const LoadSheddingConfig>()), level(NONE), overloadedBlocks(0),
+                    relaxedBlocks(0), appliedSynthCount(0), transitionCount(0) {
+        ranking.reserve(LOAD_SHEDDING_MAX_RANKED);
+    }
+
+    void configure(const LoadSheddingConfig& newConfig) {
+        retirer.retire(std::atomic_exchange(&config, std::make_shared<const LoadSheddingConfig>(newConfig)));
+    }
+
+    void update(double load, uint64_t callback, const SessionList& sessions) {
+        auto currentConfig = std::atomic_load(&config);
+        int currentLevel = level.load(std::memory_order_relaxed);
+
+        int targetLevel = currentLevel;
+        if (!currentConfig->enabled) {
+            targetLevel = NONE;
+        } else if (load > currentConfig->highLoad) {
+            relaxedBlocks = 0;
+            if (++overloadedBlocks >= currentConfig->escalateBlocks && currentLevel < MUTED_LOW_PRIORITY) {
+                targetLevel = currentLevel + 1;
+            }
+        } else if (load < currentConfig->lowLoad) {
+            overloadedBlocks = 0;
+            if (++relaxedBlocks >= currentConfig->restoreBlocks && currentLevel > NONE) {
+                targetLevel = currentLevel - 1;
+            }
+        } else {
+            overloadedBlocks = 0;
+            relaxedBlocks = 0;
+        }
+
+        if (targetLevel != currentLevel) {
+            overloadedBlocks = 0;
+            relaxedBlocks = 0;
+            level.store(targetLevel, std::memory_order_relaxed);
+            recordTransition(callback, currentLevel, targetLevel, load);
+            apply(sessions, *currentConfig, targetLevel);
+        } else if (currentLevel > NONE && countSynths(sessions) != appliedSynthCount) {
+            apply(sessions, *currentConfig, currentLevel);  // Degrade synths registered in the meantime as well
+        }
+    }
+
+    void addStats(pybind11::dict& stats) const {
+        const uint64_t count = transitionCount.load(std::memory_order_acquire);
+        pybind11::list history;
+        for (uint64_t i = count > LOAD_SHEDDING_HISTORY ? count - LOAD_SHEDDING_HISTORY : 0; i < count; ++i) {
+            const auto& transition = transitions[i % LOAD_SHEDDING_HISTORY];
+            pybind11::dict entry;
+            entry["callback"] = transition.callback;
+            entry["from_level"] = transition.fromLevel;
+            entry["to_level"] = transition.toLevel;
+            entry["load"] = transition.load;
+            history.append(entry);
+        }
+        stats["load_shedding_level"] = level.load(std::memory_order_relaxed);
+        stats["load_shedding_transition_count"] = count;
+        stats["load_shedding_transitions"] = history;
+    }
+
+private:
+    struct Transition {
+        uint64_t callback;
+        int fromLevel;
+        int toLevel;
+        double load;
+    };
+
+    void recordTransition(uint64_t callback, int fromLevel, int toLevel, double load) {
+        const uint64_t count = transitionCount.load(std::memory_order_relaxed);
+        transitions[count % LOAD_SHEDDING_HISTORY] = {callback, fromLevel, toLevel, load};
+        transitionCount.store(count + 1, std::memory_order_release);
+    }
+
+    static size_t countSynths(const SessionList& sessions) {
+        size_t count = 0;
+        for (const auto& session : sessions) {
+            count += session->getSynthCount();
+        }
+        return count;
+    }
+
+    struct RankedSynth {
+        SynthWrapper* synth;
+        int priority;
+        size_t index;
+    };
+
+    // Sets quality and mute state of all synths for a level, without allocating. The synths kept
+    // from level CAPPED_SYNTHS on are selected in linear time with nth_element.
+    void apply(const SessionList& sessions, const LoadSheddingConfig& currentConfig, int targetLevel) {
+        ranking.clear();
+        size_t index = 0;
+        for (const auto& session : sessions) {
+            session->forEachSynth([&](SynthWrapper& synth) {
+                synth.setReducedQuality(targetLevel >= REDUCED_FILTERS);
+                const bool lowPriority = targetLevel >= MUTED_LOW_PRIORITY && synth.getPriority() < currentConfig.mutePriority;
+                synth.setMuted(lowPriority);
+                if (targetLevel >= CAPPED_SYNTHS && !lowPriority) {
+                    if (ranking.size() < ranking.capacity()) {
+                        ranking.push_back({&synth, synth.getPriority(), index});
+                    } else {
+                        synth.setMuted(true);  // Beyond what can be ranked without allocating
+                    }
+                }
+                ++index;
+            });
+        }
+        appliedSynthCount = index;
+
+        if (ranking.size() > currentConfig.maxSynths) {
+            // Higher priority first, earlier registered synths win ties
+            auto kept = ranking.begin() + currentConfig.maxSynths;
+            std::nth_element(ranking.begin(), kept, ranking.end(), [](const RankedSynth& a, const RankedSynth& b) {
+                return a.priority != b.priority ? a.priority > b.priority : a.index < b.index;
+            });
+            for (auto it = kept; it != ranking.end(); ++it) {
+                it->synth->setMuted(true);
+            }
+        }
+    }
+
+    std::shared_ptr<const LoadSheddingConfig> config;  // Copy on write, read by the audio thread, see SnapshotRetirer
+    SnapshotRetirer retirer;
+    std::atomic<int> level;
+    unsigned int overloadedBlocks, relaxedBlocks;
+    size_t appliedSynthCount;
+    std::vector<RankedSynth> ranking;  // Preallocated for LOAD_SHEDDING_MAX_RANKED synths
+    std::array<Transition, LOAD_SHEDDING_HISTORY> transitions;
+    std::atomic<uint64_t> transitionCount;
+};
+
 class AudioEngine {
 public:
-    AudioEngine(ControlParameters& controlParams) : dac(nullptr), controlParams(controlParams) {}
+    AudioEngine(std::shared_ptr<ControlParameters> controlParams)
+        : dac(nullptr), sessions(std::make_shared<const SessionList>()), effects(std::make_shared<const EffectBusList>()),
+          busBuffer(BUFFER_SIZE), synthBuffer(BUFFER_SIZE), sendBuffer(MAX_EFFECT_BUSES * BUFFER_SIZE), tapRing(SAMPLE_RATE * TAP_RING_SECONDS),
+          tapEnabled(false), tapDroppedFrames(0), meterRms(0.0f), meterPeak(0.0f), meterPeakHold(0.0f) {
+        resetCallbackStats();
+        defaultSession = createSession("default", controlParams);
+    }
 
     ~AudioEngine() {
         stop();
@@ -171,9 +1312,156 @@ public:
     }
 
     void registerSynth(const std::string& name, std::shared_ptr<SynthWrapper> synth) {
-        mixer.addInput(synth->getSynth());
-        synths.push_back(synth);
-        controlParams.registerSynth(name, synth);
+        defaultSession->registerSynth(name, synth);
+    }
+
+    void unregisterSynth(const std::string& name) {
+        defaultSession->unregisterSynth(name);
+    }
+
+    std::shared_ptr<AudioSession> createSession(const std::string& name, std::shared_ptr<ControlParameters> controlParams) {
+        std::lock_guard<std::mutex> lock(sessionsMutex);
+        auto current = std::atomic_load(&sessions);
+        for (const auto& session : *current) {
+            if (session->getName() == name) {
+                throw std::invalid_argument("Session '" + name + "' already exists");
+            }
+        }
+
+        auto session = std::make_shared<AudioSession>(name, std::move(controlParams));
+        auto updated = std::make_shared<SessionList>(*current);
+        updated->push_back(session);
+        retirer.retire(std::atomic_exchange(&sessions, std::shared_ptr<const SessionList>(updated)));
+        return session;
+    }
+
+    void removeSession(const std::string& name) {
+        std::lock_guard<std::mutex> lock(sessionsMutex);
+        auto updated = std::make_shared<SessionList>(*std::atomic_load(&sessions));
+        updated->erase(std::remove_if(updated->begin(), updated->end(),
+                                      [&name](const std::shared_ptr<AudioSession>& session) { return session->getName() == name; }),
+                       updated->end());
+        retirer.retire(std::atomic_exchange(&sessions, std::shared_ptr<const SessionList>(updated)));
+    }
+
+    StepSequencer& getSequencer() {
+        return defaultSession->getSequencer();
+    }
+
+    // Puts an effect on a shared bus, replacing the previous one. Synths feed it with setSend.
+    void setEffectBus(unsigned int bus, std::shared_ptr<Effect> effect) {
+        if (bus >= MAX_EFFECT_BUSES) {
+            throw std::out_of_range("There are only " + std::to_string(MAX_EFFECT_BUSES) + " effect buses");
+        }
+        std::lock_guard<std::mutex> lock(effectsMutex);
+        auto updated = std::make_shared<EffectBusList>(*std::atomic_load(&effects));
+        (*updated)[bus] = std::move(effect);
+        retirer.retire(std::atomic_exchange(&effects, std::shared_ptr<const EffectBusList>(updated)));
+    }
+
+    void removeEffectBus(unsigned int bus) {
+        setEffectBus(bus, nullptr);
+    }
+
+    size_t getSessionCount() const {
+        return std::atomic_load(&sessions)->size();
+    }
+
+    pybind11::dict getCallbackStats() const {
+        pybind11::dict stats;
+        stats["callbacks"] = callbacks.load();
+        stats["load"] = lastLoad.load();
+        const uint64_t count = callbacks.load();
+        stats["average_load"] = count > 0 ? totalLoad.load() / count : 0.0;
+        stats["max_load"] = maxLoad.load();
+        stats["overloads"] = overloads.load();
+        loadShedder.addStats(stats);
+        return stats;
+    }
+
+    void configureLoadShedding(bool enabled, double highLoad, double lowLoad, unsigned int escalateBlocks,
+                               unsigned int restoreBlocks, unsigned int maxSynths, int mutePriority) {
+        LoadSheddingConfig config;
+        config.enabled = enabled;
+        config.highLoad = highLoad;
+        config.lowLoad = lowLoad;
+        config.escalateBlocks = escalateBlocks;
+        config.restoreBlocks = restoreBlocks;
+        config.maxSynths = maxSynths;
+        config.mutePriority = mutePriority;
+        loadShedder.configure(config);
+    }
+
+    void resetCallbackStats() {
+        callbacks = 0;
+        lastLoad = 0.0;
+        totalLoad = 0.0;
+        maxLoad = 0.0;
+        overloads = 0;
+    }
+
+    void startRecording(const std::string& filename) {
+        recorder.start(filename);
+    }
+
+    void stopRecording() {
+        recorder.stop();
+    }
+
+    pybind11::dict getRecordingStats() const {
+        return recorder.getStats();
+    }
+
+    // Renders the sessions offline directly into a caller-provided float32 array
+    size_t render(pybind11::array_t<float, pybind11::array::c_style> out) {
+        if (dac) {
+            throw std::runtime_error("Cannot render offline while the audio stream is running");
+        }
+        if (out.ndim() != 1) {
+            throw std::invalid_argument("render expects a one-dimensional float32 array");
+        }
+        float* buffer = out.mutable_data();
+        const size_t nFrames = static_cast<size_t>(out.shape(0));
+
+        pybind11::gil_scoped_release release;
+        for (size_t offset = 0; offset < nFrames; offset += BUFFER_SIZE) {
+            unsigned int chunk = static_cast<unsigned int>(std::min<size_t>(BUFFER_SIZE, nFrames - offset));
+            processBlock(buffer + offset, chunk);
+            updateMeters(buffer + offset, chunk);
+        }
+        return nFrames;
+    }
+
+    // The live output tap buffers up to TAP_RING_SECONDS of output for Python to read. When the ring
+    // is full the audio thread drops the newest frames, so a reader that falls behind gets stale audio
+    // followed by a gap. It can check tap_dropped_frames in getMeters and resync by enabling the tap again.
+    void enableTap(bool enabled) {
+        if (enabled) {
+            tapRing.discard();
+            tapDroppedFrames = 0;
+        }
+        tapEnabled.store(enabled, std::memory_order_release);
+    }
+
+    // Copies the tapped output into a caller-provided float32 array, returns the number of frames read
+    size_t readTap(pybind11::array_t<float, pybind11::array::c_style> out) {
+        if (out.ndim() != 1) {
+            throw std::invalid_argument("readTap expects a one-dimensional float32 array");
+        }
+        return tapRing.read(out.mutable_data(), static_cast<size_t>(out.shape(0)));
+    }
+
+    size_t getTapAvailable() const {
+        return tapRing.available();
+    }
+
+    pybind11::dict getMeters() {
+        pybind11::dict meters;
+        meters["rms"] = meterRms.load(std::memory_order_relaxed);
+        meters["peak"] = meterPeak.load(std::memory_order_relaxed);
+        meters["peak_hold"] = meterPeakHold.exchange(0.0f, std::memory_order_relaxed);  // Peak since the last read
+        meters["tap_dropped_frames"] = tapDroppedFrames.load(std::memory_order_relaxed);
+        return meters;
     }
 
 private:
@@ -181,33 +1469,193 @@ private:
         auto* engine = static_cast<AudioEngine*>(userData);
         auto* buffer = static_cast<float*>(outputBuffer);
 
-        engine->mixer.fillBufferOfFloats(buffer, nFrames, 1);
+        auto renderStart = std::chrono::steady_clock::now();
+        engine->processBlock(buffer, nFrames);
+        std::chrono::duration<double> renderTime = std::chrono::steady_clock::now() - renderStart;
+        const double load = renderTime.count() * SAMPLE_RATE / nFrames;
+        engine->updateCallbackStats(load);
+        engine->loadShedder.update(load, engine->callbacks.load(std::memory_order_relaxed), *std::atomic_load(&engine->sessions));
+
+        engine->recorder.push(buffer, nFrames);
+        engine->updateMeters(buffer, nFrames);
+        if (engine->tapEnabled.load(std::memory_order_acquire)) {
+            // The ring only holds what Python has not read yet, frames that do not fit are dropped and counted
+            size_t written = engine->tapRing.write(buffer, nFrames);
+            engine->tapDroppedFrames.fetch_add(nFrames - written, std::memory_order_relaxed);
+        }
 
         return 0;
     }
 
+    void updateMeters(const float* buffer, unsigned int nFrames) {
+        float sumOfSquares = 0.0f;
+        float peak = 0.0f;
+        for (unsigned int i = 0; i < nFrames; ++i) {
+            sumOfSquares += buffer[i] * buffer[i];
+            peak = std::max(peak, std::fabs(buffer[i]));
+        }
+        meterRms.store(nFrames > 0 ? std::sqrt(sumOfSquares / nFrames) : 0.0f, std::memory_order_relaxed);
+        meterPeak.store(peak, std::memory_order_relaxed);
+
+        float hold = meterPeakHold.load(std::memory_order_relaxed);
+        while (peak > hold && !meterPeakHold.compare_exchange_weak(hold, peak, std::memory_order_relaxed)) {}
+    }
+
+    // Mixes all sessions into the output, in chunks of at most BUFFER_SIZE frames. Each effect
+    // bus is processed once per chunk on the sum of everything sent to it.
+    void processBlock(float* output, unsigned int nFrames) {
+        std::fill(output, output + nFrames, 0.0f);
+        auto currentSessions = std::atomic_load(&sessions);
+        auto currentEffects = std::atomic_load(&effects);
+
+        for (unsigned int offset = 0; offset < nFrames; offset += BUFFER_SIZE) {
+            unsigned int chunk = std::min<unsigned int>(BUFFER_SIZE, nFrames - offset);
+            std::fill(sendBuffer.begin(), sendBuffer.end(), 0.0f);
+            for (const auto& session : *currentSessions) {
+                session->process(output + offset, busBuffer.data(), synthBuffer.data(), sendBuffer.data(), *currentEffects, chunk);
+            }
+
+            for (unsigned int bus = 0; bus < MAX_EFFECT_BUSES; ++bus) {
+                const auto& effect = (*currentEffects)[bus];
+                if (!effect) continue;
+                float* wet = sendBuffer.data() + bus * BUFFER_SIZE;
+                effect->process(wet, chunk);
+                const float returnGain = effect->getReturnGain();
+                for (unsigned int i = 0; i < chunk; ++i) {
+                    output[offset + i] += wet[i] * returnGain;
+                }
+            }
+        }
+    }
+
+    // Load is the render time relative to the time the block takes to play back
+    void updateCallbackStats(double load) {
+        callbacks.fetch_add(1, std::memory_order_relaxed);
+        lastLoad.store(load, std::memory_order_relaxed);
+        totalLoad.store(totalLoad.load(std::memory_order_relaxed) + load, std::memory_order_relaxed);
+        if (load > maxLoad.load(std::memory_order_relaxed)) {
+            maxLoad.store(load, std::memory_order_relaxed);
+        }
+        if (load >= 1.0) {
+            overloads.fetch_add(1, std::memory_order_relaxed);
+        }
+    }
+
     RtAudio* dac;
-    Tonic::Mixer mixer;
-    std::vector<std::shared_ptr<SynthWrapper>> synths;
-    ControlParameters& controlParams;
+    std::shared_ptr<const SessionList> sessions;  // Copy on write, read by the audio thread, see SnapshotRetirer
+    std::mutex sessionsMutex;
+    std::shared_ptr<AudioSession> defaultSession;
+    std::shared_ptr<const EffectBusList> effects;  // Copy on write, read by the audio thread, see SnapshotRetirer
+    std::mutex effectsMutex;
+    SnapshotRetirer retirer;  // Shared by the session and effect lists
+    std::vector<float> busBuffer, synthBuffer, sendBuffer;
+    AudioRecorder recorder;
+    LoadShedder loadShedder;
+    SpscRingBuffer<float> tapRing;
+    std::atomic<bool> tapEnabled;
+    std::atomic<uint64_t> tapDroppedFrames;
+    std::atomic<float> meterRms, meterPeak, meterPeakHold;
+    std::atomic<uint64_t> callbacks, overloads;
+    std::atomic<double> lastLoad, totalLoad, maxLoad;
 };
 
 namespace py = pybind11;
 
 PYBIND11_MODULE(audio_engine, m) {
+    m.attr("SAMPLE_RATE") = SAMPLE_RATE;
+    m.attr("BUFFER_SIZE") = BUFFER_SIZE;
+
     py::class_<AudioEngine>(m, "AudioEngine")
-        .def(py::init<ControlParameters&>())
+        .def(py::init<std::shared_ptr<ControlParameters>>())
         .def("start", &AudioEngine::start)
         .def("stop", &AudioEngine::stop)
-        .def("registerSynth", &AudioEngine::registerSynth);
+        .def("registerSynth", &AudioEngine::registerSynth)
+        .def("unregisterSynth", &AudioEngine::unregisterSynth)
+        .def("createSession", &AudioEngine::createSession)
+        .def("removeSession", &AudioEngine::removeSession)
+        .def("getSessionCount", &AudioEngine::getSessionCount)
+        .def("getSequencer", &AudioEngine::getSequencer, py::return_value_policy::reference_internal)
+        .def("setEffectBus", &AudioEngine::setEffectBus)
+        .def("removeEffectBus", &AudioEngine::removeEffectBus)
+        .def("getCallbackStats", &AudioEngine::getCallbackStats)
+        .def("resetCallbackStats", &AudioEngine::resetCallbackStats)
+        .def("configureLoadShedding", &AudioEngine::configureLoadShedding,
+             py::arg("enabled") = true, py::arg("high_load") = 0.8, py::arg("low_load") = 0.5,
+             py::arg("escalate_blocks") = 8, py::arg("restore_blocks") = 200,
+             py::arg("max_synths") = 8, py::arg("mute_priority") = 0)
+        .def("startRecording", &AudioEngine::startRecording)
+        .def("stopRecording", &AudioEngine::stopRecording)
+        .def("getRecordingStats", &AudioEngine::getRecordingStats)
+        .def("render", &AudioEngine::render, py::arg("out").noconvert())
+        .def("enableTap", &AudioEngine::enableTap)
+        .def("readTap", &AudioEngine::readTap, py::arg("out").noconvert())
+        .def("getTapAvailable", &AudioEngine::getTapAvailable)
+        .def("getMeters", &AudioEngine::getMeters);
+
+    py::class_<AudioSession, std::shared_ptr<AudioSession>>(m, "AudioSession")
+        .def("registerSynth", &AudioSession::registerSynth)
+        .def("unregisterSynth", &AudioSession::unregisterSynth)
+        .def("setGain", &AudioSession::setGain)
+        .def("getGain", &AudioSession::getGain)
+        .def("getName", &AudioSession::getName)
+        .def("getSynthCount", &AudioSession::getSynthCount)
+        .def("getSequencer", &AudioSession::getSequencer, py::return_value_policy::reference_internal);
+
+    py::class_<StepPattern, std::shared_ptr<StepPattern>>(m, "StepPattern")
+        .def(py::init<unsigned int, unsigned int>(), py::arg("num_steps"), py::arg("repetitions") = 1)
+        .def("addNote", &StepPattern::addNote, py::arg("step"), py::arg("synth"), py::arg("pitch"),
+             py::arg("amplitude"), py::arg("length"), py::arg("dynamic") = false)
+        .def("setNote", &StepPattern::setNote)
+        .def("getId", &StepPattern::getId)
+        .def("getNumSteps", &StepPattern::getNumSteps)
+        .def("getRepetitions", &StepPattern::getRepetitions)
+        .def("getNoteCount", &StepPattern::getNoteCount);
 
-    py::class_<SynthWrapper, std::shared_ptr<SynthWrapper>>(m, "SynthWrapper");
+    py::class_<StepSequencer>(m, "StepSequencer")
+        .def("setTempo", &StepSequencer::setTempo, py::arg("changes"))
+        .def("start", &StepSequencer::start, py::arg("pattern"), py::arg("first_step") = 0)
+        .def("queuePattern", &StepSequencer::queuePattern, py::arg("pattern"))
+        .def("finish", &StepSequencer::finish)
+        .def("stop", &StepSequencer::stop)
+        .def("isRunning", &StepSequencer::isRunning)
+        .def("setReportNotes", &StepSequencer::setReportNotes)
+        .def("pollEvents", &StepSequencer::pollEvents)
+        .def("getDroppedEvents", &StepSequencer::getDroppedEvents);
+
+    py::class_<SynthWrapper, std::shared_ptr<SynthWrapper>>(m, "SynthWrapper")
+        .def("silence", &SynthWrapper::silence)
+        .def("setSend", &SynthWrapper::setSend)
+        .def("getSend", &SynthWrapper::getSend)
+        .def("setPriority", &SynthWrapper::setPriority)
+        .def("getPriority", &SynthWrapper::getPriority)
+        .def("isMuted", &SynthWrapper::isMuted);
 
     py::class_<TonicSimpleADSRFilterSynth, SynthWrapper, std::shared_ptr<TonicSimpleADSRFilterSynth>>(m, "TonicSimpleADSRFilterSynth")
         .def(py::init<const std::string&, float, float, float, float, float, float>())
         .def("startNote", &TonicSimpleADSRFilterSynth::startNote)
         .def("stopNote", &TonicSimpleADSRFilterSynth::stopNote);
 
+    m.attr("MAX_EFFECT_BUSES") = MAX_EFFECT_BUSES;
+
+    py::class_<Effect, std::shared_ptr<Effect>>(m, "Effect")
+        .def("setReturnGain", &Effect::setReturnGain)
+        .def("getReturnGain", &Effect::getReturnGain);
+
+    py::class_<DelayEffect, Effect, std::shared_ptr<DelayEffect>>(m, "DelayEffect")
+        .def(py::init<float, float, float>(), py::arg("delay_seconds"), py::arg("feedback"), py::arg("damping") = 0.3f)
+        .def("setFeedback", &DelayEffect::setFeedback)
+        .def("setDamping", &DelayEffect::setDamping);
+
+    py::class_<ReverbEffect, Effect, std::shared_ptr<ReverbEffect>>(m, "ReverbEffect")
+        .def(py::init<float, float>(), py::arg("room_size") = 0.5f, py::arg("damping") = 0.5f)
+        .def("setRoomSize", &ReverbEffect::setRoomSize)
+        .def("setDamping", &ReverbEffect::setDamping);
+
+    py::class_<FilterEffect, Effect, std::shared_ptr<FilterEffect>>(m, "FilterEffect")
+        .def(py::init<float, float>(), py::arg("cutoff"), py::arg("q") = 0.707f)
+        .def("setCutoff", &FilterEffect::setCutoff)
+        .def("setQ", &FilterEffect::setQ);
+
     py::class_<ControlParameters, std::shared_ptr<ControlParameters>>(m, "ControlParameters")
         .def(py::init<>())
         .def("linkParameter", &ControlParameters::linkParameter)
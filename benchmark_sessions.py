@@ -0,0 +1,54 @@
+import sys
+import time
+
+# Add bindings directory to the Python path
+sys.path.insert(0, "./bindings")
+
+import audio_engine
+
+# Benchmark settings
+session_counts = [1, 2, 4, 8, 16, 32]
+synths_per_session = 4
+warmup_duration = 0.5  # Seconds before the callback stats are reset
+measure_duration = 3.0  # Seconds the callback load is measured
+
+
+def measure_callback_load(num_sessions):
+    """
+    Plays a held note on every synth of `num_sessions` sessions sharing one engine.
+
+    Args:
+        num_sessions (int): The number of sessions to create.
+
+    Returns:
+        dict: The callback stats of the engine after the measurement.
+    """
+    engine = audio_engine.AudioEngine(audio_engine.ControlParameters())
+    control_params = []
+    synths = []
+    for session_index in range(num_sessions):
+        control_params.append(audio_engine.ControlParameters())
+        session = engine.createSession(f"session_{session_index}", control_params[-1])
+        session.setGain(1.0 / num_sessions)
+        for synth_index in range(synths_per_session):
+            synth = audio_engine.TonicSimpleADSRFilterSynth("SawtoothWave", 0.05, 0.1, 0.6, 0.4, 250.0, 1.0)
+            session.registerSynth(f"synth_{synth_index}", synth)
+            synths.append(synth)
+
+    engine.start()
+    for index, synth in enumerate(synths):
+        synth.startNote(48 + index % 24, 0.5)
+
+    time.sleep(warmup_duration)
+    engine.resetCallbackStats()
+    time.sleep(measure_duration)
+    stats = engine.getCallbackStats()
+    engine.stop()
+    return stats
+
+
+print(f"{'sessions':>8} {'synths':>7} {'avg load':>9} {'max load':>9} {'overloads':>10}")
+for num_sessions in session_counts:
+    stats = measure_callback_load(num_sessions)
+    print(f"{num_sessions:>8} {num_sessions * synths_per_session:>7} {stats['average_load']:>9.2%} "
+          f"{stats['max_load']:>9.2%} {stats['overloads']:>10}")
@@ -2,7 +2,8 @@ import random
 from stranger_song import StrangerBPMSong
 from stranger_part import StrangerPart
 from stranger_note_generator_bar_based import StrangerNoteGeneratorBarBased
-from audio_engine import TonicSimpleADSRFilterSynth
+from stranger_step_pattern import StrangerStepPattern
+from audio_engine import TonicSimpleADSRFilterSynth, ReverbEffect
 
 
 scale_list = [
@@ -55,6 +56,20 @@ class NoteGeneratorPatternScaleBased(StrangerNoteGeneratorBarBased):
         return False
 
 
+class ScaleStepPattern(StrangerStepPattern):
+    def __init__(self, synth_name, note_pattern, scale, note_value, subdivision):
+        super().__init__([len(bar) for bar in note_pattern], note_value, subdivision, repetitions=2)  # play twice
+        self._scale = scale
+        for bar, beats in enumerate(note_pattern):
+            for beat, (pitch, amplitude) in enumerate(beats):
+                dynamic = pitch == "random"
+                self.add_note(self.get_step(bar, beat), synth_name, 0 if dynamic else pitch, amplitude, subdivision, dynamic)
+
+    def get_dynamic_note(self, note_index):
+        # A new random note of the scale on every repetition
+        return pick_random_note_on_scale(self._scale), self.get_notes()[note_index]["amplitude"]
+
+
 class SimplePart(StrangerPart):
     def __init__(self, control_params, synth_name, part_name, subdivision):
         super().__init__(control_params)
@@ -83,27 +98,45 @@ class SimplePart(StrangerPart):
         note_value = 4
 
         self._note_generator = NoteGeneratorPatternScaleBased(control_params, synth_name, note_pattern, self._scale, beats_per_bar, note_value, subdivision)
+        self._step_pattern = ScaleStepPattern(synth_name, note_pattern, self._scale, note_value, subdivision)
 
     def get_note_generator(self):
         return self._note_generator
+
+    def get_step_pattern(self):
+        # Played by the engine's step sequencer, the note generator is used for offline rendering
+        return self._step_pattern
     
     def get_part_name(self):
         return self._part_name
 
 
 class SimpleMultiPartSong(StrangerBPMSong):
-    def __init__(self, control_params, bpm, max_division = 16):
+    def __init__(self, control_params, bpm, max_division = 16, synth_pool = None, reverb = False):
         super().__init__(control_params, bpm, max_division)
         self._synth_name = "simple_synth"
+        synth_config = ("SquareWave", 0.05, 0.1, 0.6, 0.4, 250.0, 1.0)
+        # A StrangerSynthPool hands out prebuilt synths, e.g. when many songs are started one after another
+        synth = synth_pool.acquire(*synth_config) if synth_pool is not None else TonicSimpleADSRFilterSynth(*synth_config)
         self._synthesizers = {
-            self._synth_name: TonicSimpleADSRFilterSynth("SquareWave", 0.05, 0.1, 0.6, 0.4, 250.0, 1.0)
+            self._synth_name: synth
         }
+        # The reverb is opt-in, so the song stays dry unless asked for
+        self._reverb_bus = 0 if reverb else None
+        if self._reverb_bus is not None:
+            synth.setSend(self._reverb_bus, 0.3)
         self._max_division = max_division
 
         self._current_part_index = 0
 
     def get_synthesizers(self):
         return self._synthesizers
+
+    def get_effect_buses(self):
+        if self._reverb_bus is None:
+            return {}
+        # One reverb shared by all synths, instead of one per synth
+        return {self._reverb_bus: ReverbEffect(room_size=0.7, damping=0.4)}
     
     def _get_next_part(self):
         """
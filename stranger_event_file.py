@@ -0,0 +1,288 @@
+import struct
+import numpy as np
+from stranger_note_generator_event_stream import EVENT_DTYPE, StrangerNoteGeneratorEventStream
+
+
+# File layout (little endian):
+#   header:      magic, header size, max division, number of events, number of subdivisions, number of synths
+#   synth names: UTF-8, separated by newlines, zero padded so the records start 16 byte aligned
+#   records:     number of events * EVENT_DTYPE
+EVENT_FILE_MAGIC = b"STRGEVT1"
+_HEADER_STRUCT = struct.Struct("<8sIIQQH6x")
+_HEADER_ALIGNMENT = 16
+
+
+def read_event_file_header(filename):
+    """
+    Reads the header of a binary event file.
+
+    Args:
+        filename (str): The path of the event file.
+
+    Returns:
+        dict: The header fields `header_size`, `max_division`, `num_events`,
+              `num_subdivisions` and `synth_names`.
+
+    Raises:
+        ValueError: If the file is not a binary event file.
+    """
+    with open(filename, "rb") as f:
+        magic, header_size, max_division, num_events, num_subdivisions, num_synths = _HEADER_STRUCT.unpack(
+            f.read(_HEADER_STRUCT.size))
+        if magic != EVENT_FILE_MAGIC:
+            raise ValueError(f"{filename} is not a binary event file.")
+        names = f.read(header_size - _HEADER_STRUCT.size).rstrip(b"\0").decode("utf-8")
+
+    synth_names = names.split("\n") if num_synths > 0 else []
+    return {
+        "header_size": header_size,
+        "max_division": max_division,
+        "num_events": num_events,
+        "num_subdivisions": num_subdivisions,
+        "synth_names": synth_names,
+    }
+
+
+class StrangerEventFileWriter:
+    """
+    Writes a fully expanded event stream to a compact binary event file.
+
+    Events are collected in a fixed-size record buffer which is flushed to disk
+    whenever it is full, so arbitrarily long pieces can be written with constant memory.
+
+    Attributes:
+        _file (file): The opened output file.
+        _synth_ids (dict): A mapping of synthesizer names to synth ids.
+        _max_division (int): The subdivision grid of the events (e.g., 16 for 16th notes).
+        _buffer (numpy.ndarray): The record buffer.
+        _buffered (int): The number of records in the buffer.
+        _num_events (int): The number of records written so far.
+        _last_subdivision (int): The subdivision of the last added event.
+    """
+
+    def __init__(self, filename, synth_names, max_division=0, buffer_size=65536):
+        """
+        Opens the event file and writes a preliminary header.
+
+        Args:
+            filename (str): The path of the event file.
+            synth_names (list of str): The names of all synthesizers used by the events.
+            max_division (int): The subdivision grid of the events (0 if unknown).
+            buffer_size (int): The number of records buffered before writing to disk.
+        """
+        self._synth_ids = {name: synth_id for synth_id, name in enumerate(synth_names)}
+        self._max_division = max_division
+        self._buffer = np.zeros(buffer_size, dtype=EVENT_DTYPE)
+        self._buffered = 0
+        self._num_events = 0
+        self._last_subdivision = 0
+
+        names = "\n".join(synth_names).encode("utf-8")
+        header_size = _HEADER_STRUCT.size + len(names)
+        header_size += -header_size % _HEADER_ALIGNMENT
+        self._names = names.ljust(header_size - _HEADER_STRUCT.size, b"\0")
+        self._header_size = header_size
+
+        self._file = open(filename, "wb")
+        self._write_header(0)
+
+    def add_note(self, subdivision, synth_name, pitch, amplitude, note_length):
+        """
+        Appends a note start event. Events have to be added in subdivision order.
+
+        Args:
+            subdivision (int): The subdivision index at which the note starts.
+            synth_name (str): The name of the synthesizer.
+            pitch (int): The MIDI pitch of the note.
+            amplitude (float): The amplitude of the note (converted to velocity).
+            note_length (int): The number of subdivisions the note plays.
+
+        Raises:
+            ValueError: If the event is older than the previously added one.
+        """
+        if subdivision < self._last_subdivision:
+            raise ValueError("Events have to be added in subdivision order.")
+        self._last_subdivision = subdivision
+
+        velocity = min(max(int(amplitude * 127), 0), 127)  # Convert amplitude to MIDI velocity
+        self._buffer[self._buffered] = (subdivision, self._synth_ids[synth_name], pitch, velocity, note_length)
+        self._buffered += 1
+        if self._buffered == len(self._buffer):
+            self._flush()
+
+    def close(self, num_subdivisions=None):
+        """
+        Writes the remaining events, finalizes the header and closes the file.
+
+        Args:
+            num_subdivisions (int, optional): The length of the piece in subdivisions.
+                Defaults to the subdivision after the last event.
+        """
+        self._flush()
+        if num_subdivisions is None:
+            num_subdivisions = self._last_subdivision + 1 if self._num_events > 0 else 0
+        self._file.seek(0)
+        self._write_header(num_subdivisions)
+        self._file.close()
+
+    def _write_header(self, num_subdivisions):
+        """
+        Writes the header and synth name table at the current file position.
+
+        Args:
+            num_subdivisions (int): The length of the piece in subdivisions.
+        """
+        self._file.write(_HEADER_STRUCT.pack(
+            EVENT_FILE_MAGIC, self._header_size, self._max_division,
+            self._num_events, num_subdivisions, len(self._synth_ids)))
+        self._file.write(self._names)
+
+    def _flush(self):
+        """
+        Writes the buffered records to disk.
+        """
+        self._buffer[:self._buffered].tofile(self._file)
+        self._num_events += self._buffered
+        self._buffered = 0
+
+
+def export_song_events(song, filename, max_subdivisions):
+    """
+    Expands a song into its event stream and writes it to a binary event file.
+
+    The song is walked part by part exactly like `StrangerPlayback` does, without
+    starting the audio engine and without waiting between subdivisions.
+
+    Args:
+        song (StrangerSong): The song to export.
+        filename (str): The path of the event file.
+        max_subdivisions (int): The maximum number of subdivisions to export, as songs may not end.
+
+    Returns:
+        int: The number of subdivisions that were exported.
+    """
+    max_division = song.get_max_division() or 0
+    writer = StrangerEventFileWriter(filename, list(song.get_synthesizers().keys()), max_division)
+    note_generator = song.get_next_part().get_merged_note_generator(song.get_max_division())
+
+    num_subdivisions = 0
+    while num_subdivisions < max_subdivisions:
+        for note_event in note_generator.get_next_notes():
+            writer.add_note(num_subdivisions, note_event["synth_name"], note_event["pitch"],
+                            note_event["amplitude"], note_event["note_length"])
+        num_subdivisions += 1
+
+        if note_generator.get_part_end():
+            next_part = song.get_next_part()
+            if next_part == "end":
+                break
+            elif next_part is not None:  # Repeat current part on None
+                note_generator = next_part.get_merged_note_generator(song.get_max_division())
+
+    writer.close(num_subdivisions)
+    return num_subdivisions
+
+
+class StrangerNoteGeneratorEventFile(StrangerNoteGeneratorEventStream):
+    """
+    A note generator that plays a binary event file.
+
+    The records are memory-mapped with `numpy.memmap`, so even multi-hour pieces are
+    loaded instantly and only the pages around the playback position are read from disk.
+
+    Attributes:
+        _max_division (int): The subdivision grid the events were exported on (0 if unknown).
+    """
+
+    def __init__(self, control_params, filename, loop=False):
+        """
+        Memory-maps the event file.
+
+        Args:
+            control_params (audio_engine.ControlParameters): An instance of ControlParameters.
+            filename (str): The path of the event file.
+            loop (bool): Whether to restart from the beginning at the end of the file.
+        """
+        header = read_event_file_header(filename)
+        if header["num_events"] > 0:
+            events = np.memmap(filename, dtype=EVENT_DTYPE, mode="r",
+                               offset=header["header_size"], shape=(header["num_events"],))
+        else:
+            events = np.zeros(0, dtype=EVENT_DTYPE)  # numpy.memmap cannot map an empty range
+        super().__init__(control_params, events, header["synth_names"], header["num_subdivisions"], loop)
+        self._max_division = header["max_division"]
+
+    def get_max_division(self):
+        """
+        Returns the subdivision grid the events were exported on.
+
+        Returns:
+            int: The maximum division (e.g., 16 for 16th notes), or 0 if unknown.
+        """
+        return self._max_division
+
+
+# Unit test for the binary event file format
+if __name__ == "__main__":
+    import os
+    import tempfile
+    import unittest
+
+    class TestStrangerEventFile(unittest.TestCase):
+        def setUp(self):
+            handle, self.filename = tempfile.mkstemp(suffix=".sev")
+            os.close(handle)
+
+        def tearDown(self):
+            os.remove(self.filename)
+
+        def test_round_trip_and_seek(self):
+            """
+            Test writing events, reading them back tick by tick and seeking.
+            """
+            writer = StrangerEventFileWriter(self.filename, ["bass", "lead"], max_division=16, buffer_size=2)
+            writer.add_note(0, "bass", 36, 1.0, 4)
+            writer.add_note(0, "lead", 72, 0.5, 2)
+            writer.add_note(3, "lead", 74, 0.5, 1)
+            writer.add_note(7, "bass", 38, 0.25, 8)
+            writer.close(10)
+
+            generator = StrangerNoteGeneratorEventFile(None, self.filename)
+            self.assertEqual(generator.get_length(), 10)
+            self.assertEqual(generator.get_max_division(), 16)
+            self.assertEqual(generator.get_synth_names(), ["bass", "lead"])
+
+            notes = [generator.get_next_notes() for _ in range(10)]
+            self.assertEqual([len(n) for n in notes], [2, 0, 0, 1, 0, 0, 0, 1, 0, 0])
+            self.assertEqual(notes[0][1], {"synth_name": "lead", "event": "note_start", "pitch": 72,
+                                           "amplitude": 63 / 127, "note_length": 2})
+            self.assertTrue(generator.get_part_end())
+
+            generator.seek(3)
+            self.assertEqual(generator.get_next_notes()[0]["pitch"], 74)
+            self.assertFalse(generator.get_part_end())
+
+        def test_loop(self):
+            """
+            Test that a looping generator restarts at the beginning of the file.
+            """
+            writer = StrangerEventFileWriter(self.filename, ["bass"])
+            writer.add_note(0, "bass", 36, 1.0, 1)
+            writer.close(2)
+
+            generator = StrangerNoteGeneratorEventFile(None, self.filename, loop=True)
+            counts = [len(generator.get_next_notes()) for _ in range(6)]
+            self.assertEqual(counts, [1, 0, 1, 0, 1, 0])
+
+        def test_out_of_order_events(self):
+            """
+            Test that events have to be added in subdivision order.
+            """
+            writer = StrangerEventFileWriter(self.filename, ["bass"])
+            writer.add_note(4, "bass", 36, 1.0, 1)
+            with self.assertRaises(ValueError):
+                writer.add_note(3, "bass", 36, 1.0, 1)
+            writer.close()
+
+    # Run the tests
+    unittest.main()
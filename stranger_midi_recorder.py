@@ -1,40 +1,45 @@
 from datetime import datetime
-from mido import Message, MidiFile, MidiTrack, MetaMessage, second2tick
-import time
+from mido import Message, MidiFile, MidiTrack, MetaMessage, bpm2tempo
 
 
 class StrangerMidiRecorder:
     """
     A class to handle MIDI recording for a song.
 
+    Events are placed by their subdivision index, so the MIDI ticks follow the beat grid of
+    the song and the tempo changes of its tempo map are written as set_tempo meta events.
+    Tempo changes are only written once an event or the end of the recording reaches them,
+    so tempos the playback sets before that still end up in the file.
+
     Attributes:
         _midi_file (MidiFile): The MIDI file to record notes.
         _midi_track (MidiTrack): The MIDI track to store note events.
-        _last_event_time (float): The timestamp of the last MIDI event.
+        _tempo_map (StrangerTempoMap): The tempo map of the song.
+        _last_event_tick (int): The absolute tick of the last MIDI event.
+        _tempo_recorded_until (int): The subdivision up to which tempo changes have been written.
         _synth_channels (dict): A mapping of synthesizer names to unique MIDI channels.
         _next_channel (int): The next available MIDI channel.
         _ticks_per_beat (int): The number of ticks per beat in the MIDI file.
-        _tempo (int): The tempo in microseconds per beat.
+        _ticks_per_subdivision (float): The number of ticks per subdivision of the tempo map.
     """
 
-    def __init__(self, bpm):
+    def __init__(self, tempo_map):
         """
-        Initializes the StrangerMidiRecorder with the song's BPM.
+        Initializes the StrangerMidiRecorder with the song's tempo map.
 
         Args:
-            bpm (float): The beats per minute of the song.
+            tempo_map (StrangerTempoMap): The tempo map of the song.
         """
         self._ticks_per_beat = 480  # Standard ticks per beat for compatibility with most players
         self._midi_file = MidiFile(ticks_per_beat=self._ticks_per_beat)
         self._midi_track = MidiTrack()
         self._midi_file.tracks.append(self._midi_track)
-        self._last_event_time = None  # Initialize to None to handle the first event
+        self._tempo_map = tempo_map
+        self._ticks_per_subdivision = self._ticks_per_beat * 4 / tempo_map.get_max_division()
+        self._last_event_tick = 0
+        self._tempo_recorded_until = 0
         self._synth_channels = {}
         self._next_channel = 0  # MIDI channels range from 0 to 15
-        self._tempo = int(60_000_000 / bpm)  # Convert BPM to microseconds per beat
-
-        # Set the tempo in the MIDI file
-        self._midi_track.append(MetaMessage('set_tempo', tempo=self._tempo))
 
     def _get_channel(self, synth_name):
         """
@@ -53,7 +58,7 @@ class StrangerMidiRecorder:
             self._next_channel += 1
         return self._synth_channels[synth_name]
 
-    def record_note_on(self, synth_name, pitch, amplitude):
+    def record_note_on(self, synth_name, pitch, amplitude, subdivision):
         """
         Records a note-on event in the MIDI track.
 
@@ -61,24 +66,26 @@ class StrangerMidiRecorder:
             synth_name (str): The name of the synthesizer.
             pitch (int): The MIDI pitch of the note.
             amplitude (float): The amplitude of the note (converted to velocity).
+            subdivision (int): The subdivision index at which the note starts.
         """
-        elapsed_time = self._get_elapsed_time()
-        midi_time = self._calculate_midi_time(elapsed_time)
+        self._record_tempo_changes(subdivision)
+        midi_time = self._calculate_midi_time(subdivision)
 
         channel = self._get_channel(synth_name)
         velocity = int(amplitude * 127)  # Convert amplitude to MIDI velocity
         self._midi_track.append(Message('note_on', note=pitch, velocity=velocity, time=midi_time, channel=channel))
 
-    def record_note_off(self, synth_name, pitch):
+    def record_note_off(self, synth_name, pitch, subdivision):
         """
         Records a note-off event in the MIDI track.
 
         Args:
             synth_name (str): The name of the synthesizer.
             pitch (int): The MIDI pitch of the note.
+            subdivision (int): The subdivision index at which the note ends.
         """
-        elapsed_time = self._get_elapsed_time()
-        midi_time = self._calculate_midi_time(elapsed_time)
+        self._record_tempo_changes(subdivision)
+        midi_time = self._calculate_midi_time(subdivision)
 
         channel = self._get_channel(synth_name)
         self._midi_track.append(Message('note_off', note=pitch, velocity=0, time=midi_time, channel=channel))
@@ -90,34 +97,61 @@ class StrangerMidiRecorder:
         Args:
             class_name (str): The name of the song's class.
         """
+        self._record_tempo_changes(0)  # The initial tempo, if no event has been recorded
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"{class_name}_{timestamp}.mid"
         self._midi_file.save(filename)
         print(f"MIDI file saved as {filename}.")
 
-    def _get_elapsed_time(self):
+    def _record_tempo_changes(self, subdivision):
         """
-        Calculates the elapsed time since the last event.
+        Writes the tempo changes of the tempo map up to and including a subdivision.
 
-        Returns:
-            float: The elapsed time in seconds.
+        Args:
+            subdivision (int): The subdivision of the next event.
         """
-        current_time = time.time()
-        if self._last_event_time is None:
-            self._last_event_time = current_time
-            return 0  # First event has no delay
-        elapsed_time = current_time - self._last_event_time
-        self._last_event_time = current_time
-        return elapsed_time
-
-    def _calculate_midi_time(self, elapsed_time):
+        if subdivision < self._tempo_recorded_until:
+            return
+        for change_subdivision, bpm in self._tempo_map.get_tempo_changes(self._tempo_recorded_until, subdivision + 1):
+            midi_time = self._calculate_midi_time(change_subdivision)
+            self._midi_track.append(MetaMessage('set_tempo', tempo=bpm2tempo(bpm), time=midi_time))
+        self._tempo_recorded_until = subdivision + 1
+
+    def _calculate_midi_time(self, subdivision):
         """
-        Converts elapsed time in seconds to MIDI ticks using mido.second2tick.
+        Converts a subdivision index to the delta time in MIDI ticks since the last event.
 
         Args:
-            elapsed_time (float): The elapsed time in seconds.
+            subdivision (int): The subdivision index of the event.
 
         Returns:
-            int: The elapsed time in MIDI ticks.
+            int: The delta time in MIDI ticks.
         """
-        return int(second2tick(elapsed_time, self._ticks_per_beat, self._tempo))
+        tick = round(subdivision * self._ticks_per_subdivision)
+        midi_time = max(tick - self._last_event_tick, 0)
+        self._last_event_tick += midi_time
+        return midi_time
+
+
+# Unit test for StrangerMidiRecorder
+if __name__ == "__main__":
+    import unittest
+    from stranger_tempo_map import StrangerTempoMap
+
+    class TestStrangerMidiRecorder(unittest.TestCase):
+        def test_initial_tempo(self):
+            """
+            Test that a tempo set at the start after the recorder was built is the one written.
+            """
+            tempo_map = StrangerTempoMap(120, 16)
+            recorder = StrangerMidiRecorder(tempo_map)
+            tempo_map.set_tempo(0, 90)
+            tempo_map.set_tempo(8, 60)
+            recorder.record_note_on("lead", 60, 1.0, 0)
+            recorder.record_note_off("lead", 60, 8)
+
+            tempos = [(message.tempo, message.time) for message in recorder._midi_track if message.type == "set_tempo"]
+            self.assertEqual(tempos, [(bpm2tempo(90), 0), (bpm2tempo(60), 960)])
+
+    # Run the tests
+    unittest.main()
@@ -13,6 +13,7 @@ class StrangerNoteGenerator:
     Interface:
         - get_next_notes(): Returns a list of dictionaries, where each dictionary
           represents a set of operations to be performed on synthesizers.
+        - get_subdivision(): Returns the subdivision the generator is called on.
         - get_part_can_end(): Returns a boolean indicating whether the current part has ended
           and a transition to the next part should be triggered.
 
@@ -72,6 +73,18 @@ class StrangerNoteGenerator:
         """
         raise NotImplementedError("Subclasses must implement the `get_next_notes` method.")
 
+    def get_subdivision(self):
+        """
+        Returns the subdivision the generator is called on (e.g., 4 for quarter notes).
+
+        When a part has several generators, each generator is only called once per its own
+        subdivision and its note lengths are counted in that subdivision.
+
+        Returns:
+            int or None: The subdivision, or None to be called on every tick of the playback.
+        """
+        return None
+
     def get_part_can_end(self):
         """
         Determine whether the current part of the music can end and a transition
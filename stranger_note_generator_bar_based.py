@@ -36,7 +36,8 @@ class StrangerNoteGeneratorBarBased(StrangerNoteGenerator):
         self._repetition_counter = 0
         self._on_beat = True
 
-        self._subdivisions_per_repetition = sum(beats_per_bar) * subdivision // note_value
+        self._subdivisions_per_beat = subdivision // note_value
+        self._subdivisions_per_repetition = sum(beats_per_bar) * self._subdivisions_per_beat
 
     def _update_beat(self):
         """
@@ -47,7 +48,7 @@ class StrangerNoteGeneratorBarBased(StrangerNoteGenerator):
         self._subdivision_counter += 1
 
         # Update on_beat
-        if self._subdivision_counter % self._note_value == 0:
+        if self._subdivision_counter % self._subdivisions_per_beat == 0:
             self._on_beat = True
             self._beat_counter += 1
         else:
@@ -64,6 +65,15 @@ class StrangerNoteGeneratorBarBased(StrangerNoteGenerator):
                 self._repetition_counter += 1
 
 
+    def get_subdivision(self):
+        """
+        Returns the subdivision the generator is called on.
+
+        Returns:
+            int: The subdivision (e.g., 16 for 16th notes).
+        """
+        return self._subdivision
+
     def get_current_beat(self):
         """
         Returns the current beat, bar, and repetition assuming the update has already been performed.
@@ -0,0 +1,172 @@
+import numpy as np
+from stranger_note_generator import StrangerNoteGenerator
+
+
+# Fixed-size record describing one note start in a fully expanded event stream.
+EVENT_DTYPE = np.dtype([
+    ("subdivision", "<u4"),   # Subdivision index at which the note starts
+    ("synth_id", "<u2"),      # Index into the synth name table
+    ("pitch", "u1"),          # MIDI pitch
+    ("velocity", "u1"),       # MIDI velocity (amplitude * 127)
+    ("note_length", "<u4"),   # Number of subdivisions the note plays
+])
+
+
+class StrangerNoteGeneratorEventStream(StrangerNoteGenerator):
+    """
+    A note generator that plays back a pre-computed event stream sorted by subdivision.
+
+    The events are kept in a structured NumPy array (see `EVENT_DTYPE`), which may also be a
+    `numpy.memmap`. Playback keeps a cursor into the array, so retrieving the notes of the
+    next subdivision only touches the events of that subdivision and seeking is a binary search.
+
+    Attributes:
+        _events (numpy.ndarray): The events, sorted by subdivision.
+        _event_subdivisions (numpy.ndarray): View on the subdivision column of `_events`.
+        _synth_names (list of str): The synthesizer names, indexed by synth id.
+        _length (int): The number of subdivisions in the event stream.
+        _loop_range (tuple of int or None): The (start, end) subdivisions playback wraps around in,
+            or None if playback does not loop.
+        _subdivision (int): The subdivision that was played last.
+        _position (int): The index of the first event that has not been played yet.
+    """
+
+    def __init__(self, control_params, events, synth_names, length=None, loop=False):
+        """
+        Initializes the StrangerNoteGeneratorEventStream.
+
+        Args:
+            control_params (audio_engine.ControlParameters): An instance of ControlParameters.
+            events (numpy.ndarray): Structured array with `EVENT_DTYPE`, sorted by subdivision.
+            synth_names (list of str): The synthesizer names, indexed by synth id.
+            length (int, optional): The number of subdivisions in the stream. Defaults to the
+                subdivision after the last event.
+            loop (bool): Whether to restart from the beginning at the end of the stream.
+        """
+        super().__init__(control_params)
+        self._events = events
+        self._event_subdivisions = events["subdivision"]
+        self._synth_names = list(synth_names)
+        if length is None:
+            length = int(self._event_subdivisions[-1]) + 1 if len(events) > 0 else 0
+        self._length = length
+        self._loop_range = (0, length) if loop else None
+        self._subdivision = -1
+        self._position = 0
+
+    def get_length(self):
+        """
+        Returns the number of subdivisions in the event stream.
+
+        Returns:
+            int: The length of the stream in subdivisions.
+        """
+        return self._length
+
+    def get_synth_names(self):
+        """
+        Returns the synthesizer names used by the event stream.
+
+        Returns:
+            list of str: The synthesizer names, indexed by synth id.
+        """
+        return self._synth_names
+
+    def set_loop_range(self, start_subdivision, end_subdivision):
+        """
+        Loops playback over a range of subdivisions once playback reaches its end.
+
+        Args:
+            start_subdivision (int): The first subdivision of the loop.
+            end_subdivision (int): The subdivision after the last one of the loop.
+        """
+        self._loop_range = (start_subdivision, end_subdivision)
+
+    def clear_loop_range(self):
+        """
+        Disables looping, playback stops producing notes at the end of the stream.
+        """
+        self._loop_range = None
+
+    def seek(self, subdivision):
+        """
+        Moves playback so that the next call to `get_next_notes` returns the notes of `subdivision`.
+
+        Args:
+            subdivision (int): The subdivision index to continue playback from.
+        """
+        self._subdivision = subdivision - 1
+        self._position = int(np.searchsorted(self._event_subdivisions, subdivision, side="left"))
+
+    def get_next_notes(self):
+        """
+        Returns the note start events of the next subdivision.
+
+        Returns:
+            list: A list of dictionaries in the `StrangerNoteGenerator` note format.
+        """
+        if self._loop_range is not None and self._subdivision + 1 >= self._loop_range[1]:  # Also after seeking past the loop
+            self.seek(self._loop_range[0])
+        self._subdivision += 1
+
+        start = self._position
+        end = self._find_events_end(start, self._subdivision)
+        self._position = end
+        return self._events_to_notes(self._events[start:end])
+
+    def get_part_can_end(self):
+        """
+        Returns whether the last subdivision of the event stream or loop has just been played.
+
+        Returns:
+            bool: True on the last subdivision of the stream or loop, False otherwise.
+        """
+        end = self._loop_range[1] if self._loop_range is not None else self._length
+        return self._subdivision == end - 1
+
+    def get_part_end(self):
+        """
+        Triggers a part transition at the end of the event stream or loop.
+
+        Returns:
+            bool: True on the last subdivision of the stream or loop, False otherwise.
+        """
+        return self.get_part_can_end()
+
+    def _find_events_end(self, start, subdivision):
+        """
+        Finds the end of the run of events that start at or before `subdivision`.
+
+        Args:
+            start (int): The index of the first event to look at.
+            subdivision (int): The current subdivision.
+
+        Returns:
+            int: The index after the last event belonging to `subdivision`.
+        """
+        end = start
+        num_events = len(self._event_subdivisions)
+        while end < num_events and self._event_subdivisions[end] <= subdivision:
+            end += 1
+        return end
+
+    def _events_to_notes(self, events):
+        """
+        Converts a slice of event records into the note format used by the playback.
+
+        Args:
+            events (numpy.ndarray): The event records to convert.
+
+        Returns:
+            list: A list of dictionaries in the `StrangerNoteGenerator` note format.
+        """
+        return [
+            {
+                "synth_name": self._synth_names[synth_id],
+                "event": "note_start",
+                "pitch": pitch,
+                "amplitude": velocity / 127,
+                "note_length": note_length,
+            }
+            for _, synth_id, pitch, velocity, note_length in events.tolist()
+        ]
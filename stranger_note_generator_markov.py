@@ -0,0 +1,227 @@
+from bisect import bisect_right
+import numpy as np
+from stranger_note_generator_bar_based import StrangerNoteGeneratorBarBased
+
+
+def build_scale_transition_matrix(scale_length, step_weights=None):
+    """
+    Builds a transition matrix between the degrees of a scale that weights steps by their size.
+
+    Args:
+        scale_length (int): The number of notes in the scale.
+        step_weights (dict, optional): Maps the distance in scale degrees to a weight.
+            Distances missing from the dictionary are never taken. Defaults to a melody
+            favouring steps and small leaps.
+
+    Returns:
+        numpy.ndarray: A (scale_length, scale_length) matrix whose rows sum to 1.
+    """
+    if step_weights is None:
+        step_weights = {0: 1.0, 1: 4.0, 2: 3.0, 3: 1.5, 4: 1.0}
+
+    degrees = np.arange(scale_length)
+    distances = np.abs(degrees[:, None] - degrees[None, :])
+    matrix = np.vectorize(lambda distance: step_weights.get(distance, 0.0), otypes=[np.float64])(distances)
+
+    row_sums = matrix.sum(axis=1, keepdims=True)
+    matrix = np.where(row_sums > 0, matrix, 1.0)  # Rows without any allowed step fall back to uniform
+    return matrix / matrix.sum(axis=1, keepdims=True)
+
+
+def _cumulative_table(weights):
+    """
+    Converts weights into a cumulative distribution for inverse transform sampling.
+
+    Args:
+        weights (numpy.ndarray): Non-negative weights along the last axis.
+
+    Returns:
+        numpy.ndarray: The normalized cumulative weights, with the last entry fixed to 1.
+
+    Raises:
+        ValueError: If a weight is negative or all weights of a row are 0.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    if np.any(weights < 0) or np.any(weights.sum(axis=-1) <= 0):
+        raise ValueError("Weights must be non-negative with at least one positive weight per row.")
+    table = np.cumsum(weights / weights.sum(axis=-1, keepdims=True), axis=-1)
+    table[..., -1] = 1.0  # Guard against rounding so every draw in [0, 1) finds an entry
+    return table
+
+
+class StrangerNoteGeneratorMarkov(StrangerNoteGeneratorBarBased):
+    """
+    A note generator that plays a Markov chain melody over the degrees of a scale.
+
+    The transition matrix and velocity distribution are precomputed as cumulative tables.
+    At the start of every repetition, the random numbers for all beats of the repetition
+    are drawn in one vectorized call and turned into pitches and velocities, which are
+    then served beat by beat.
+
+    Attributes:
+        _synth_name (str): The name of the synthesizer to generate notes for.
+        _scale (numpy.ndarray): The MIDI pitches of the scale degrees.
+        _pitch_table (list of list of float): The cumulative transition table per scale degree.
+        _velocity_levels (numpy.ndarray): The amplitudes notes can be played with.
+        _velocity_table (numpy.ndarray): The cumulative distribution of the velocity levels.
+        _note_length (int): The number of subdivisions each note plays.
+        _repetitions (int): The number of repetitions after which the part ends.
+        _rng (numpy.random.Generator): The random generator, seedable for reproducible melodies.
+        _state (int): The scale degree of the last sampled note.
+        _block_pitches (list of int): The pitches of the current repetition.
+        _block_amplitudes (list of float): The amplitudes of the current repetition.
+        _block_index (int): The index of the next note to serve from the block.
+    """
+
+    def __init__(self, control_params, synth_name, scale, transition_matrix, velocity_levels, velocity_weights,
+                 beats_per_bar, note_value, subdivision, note_length=None, repetitions=2, seed=None):
+        """
+        Initializes the StrangerNoteGeneratorMarkov.
+
+        Args:
+            control_params (audio_engine.ControlParameters): An instance of ControlParameters.
+            synth_name (str): The name of the synthesizer to generate notes for.
+            scale (list of int): The MIDI pitches of the scale degrees.
+            transition_matrix (numpy.ndarray): The (len(scale), len(scale)) transition weights
+                between scale degrees, e.g. from `build_scale_transition_matrix`.
+            velocity_levels (list of float): The amplitudes notes can be played with.
+            velocity_weights (list of float): The weights of the velocity levels.
+            beats_per_bar (list of int): A list specifying the number of beats per bar for each bar in the sequence.
+            note_value (int): The note value for the time signature (e.g., 4 for quarter notes, 8 for eighth notes).
+            subdivision (int): The current subdivision (e.g., 16 for 16th notes).
+            note_length (int, optional): The number of subdivisions each note plays. Defaults to one beat.
+            repetitions (int): The number of repetitions after which the part ends.
+            seed (int, optional): The seed of the random generator.
+
+        Raises:
+            ValueError: If the transition matrix does not match the scale, or a row of it or the
+                velocity weights have no positive weight.
+        """
+        if np.shape(transition_matrix) != (len(scale), len(scale)):
+            raise ValueError(f"The transition matrix must have the shape ({len(scale)}, {len(scale)}).")
+        super().__init__(control_params, beats_per_bar, note_value, subdivision)
+        self._synth_name = synth_name
+        self._scale = np.asarray(scale)
+        self._pitch_table = _cumulative_table(transition_matrix).tolist()
+        self._velocity_levels = np.asarray(velocity_levels, dtype=np.float64)
+        self._velocity_table = _cumulative_table(velocity_weights)
+        self._note_length = note_length if note_length is not None else subdivision // note_value
+        self._repetitions = repetitions
+
+        self._rng = np.random.default_rng(seed)
+        self._state = int(self._rng.integers(len(scale)))
+        self._block_pitches = []
+        self._block_amplitudes = []
+        self._block_index = 0
+
+    def _sample_block(self, num_notes):
+        """
+        Samples the pitches and amplitudes of the next `num_notes` notes.
+
+        Args:
+            num_notes (int): The number of notes to sample.
+        """
+        draws = self._rng.random((2, num_notes))
+
+        # Walking the chain is inherently sequential, but only costs a table lookup per note
+        degrees = []
+        state = self._state
+        pitch_table = self._pitch_table
+        for draw in draws[0].tolist():
+            state = bisect_right(pitch_table[state], draw)
+            degrees.append(state)
+        self._state = state
+
+        self._block_pitches = self._scale[degrees].tolist()
+        self._block_amplitudes = self._velocity_levels[np.searchsorted(self._velocity_table, draws[1], side="right")].tolist()
+        self._block_index = 0
+
+    def _get_next_notes(self):
+        """
+        Serves the next note of the current repetition on every beat.
+
+        Returns:
+            list: A list of dictionaries in the `StrangerNoteGenerator` note format.
+        """
+        on_beat, beat_counter, bar_counter, repetition_counter, max_beat, max_bar = self.get_current_beat()
+        if not on_beat:
+            return []
+
+        if beat_counter == 1 and bar_counter == 1:
+            self._sample_block(sum(self._beats_per_bar))
+
+        pitch = self._block_pitches[self._block_index]
+        amplitude = self._block_amplitudes[self._block_index]
+        self._block_index += 1
+        return [
+            {
+                "synth_name": self._synth_name,
+                "event": "note_start",
+                "pitch": pitch,
+                "amplitude": amplitude,
+                "note_length": self._note_length,
+            },
+        ]
+
+    def get_part_end(self):
+        """
+        Triggers a part transition after the configured number of repetitions.
+
+        Returns:
+            bool: True on the last subdivision of the last repetition, False otherwise.
+        """
+        return self.get_part_can_end() and self._repetition_counter + 1 >= self._repetitions
+
+
+# Unit test for StrangerNoteGeneratorMarkov
+if __name__ == "__main__":
+    import unittest
+
+    class TestStrangerNoteGeneratorMarkov(unittest.TestCase):
+        scale = [60, 62, 64, 65, 67, 69, 71]
+
+        def create_generator(self, seed):
+            return StrangerNoteGeneratorMarkov(
+                None, "lead", self.scale, build_scale_transition_matrix(len(self.scale), {1: 1.0}),
+                [0.3, 0.6, 0.9], [1, 2, 1], [4, 4], 4, 16, repetitions=3, seed=seed)
+
+        def play(self, generator, num_subdivisions):
+            notes = []
+            part_ends = []
+            for _ in range(num_subdivisions):
+                notes.extend(generator.get_next_notes())
+                part_ends.append(generator.get_part_end())
+            return notes, part_ends
+
+        def test_melody(self):
+            """
+            Test that notes are played on every beat, stay on the scale and only move by single steps.
+            """
+            notes, part_ends = self.play(self.create_generator(seed=1), 3 * 32)
+            self.assertEqual(len(notes), 3 * 8)
+            degrees = [self.scale.index(note["pitch"]) for note in notes]
+            for previous, current in zip(degrees, degrees[1:]):
+                self.assertEqual(abs(previous - current), 1)
+            self.assertTrue(all(note["amplitude"] in (0.3, 0.6, 0.9) for note in notes))
+            self.assertTrue(all(note["note_length"] == 4 for note in notes))
+            self.assertEqual([i for i, part_end in enumerate(part_ends) if part_end], [3 * 32 - 1])
+
+        def test_seed(self):
+            """
+            Test that the same seed produces the same melody.
+            """
+            first, _ = self.play(self.create_generator(seed=7), 64)
+            second, _ = self.play(self.create_generator(seed=7), 64)
+            self.assertEqual(first, second)
+
+        def test_invalid_weights(self):
+            """
+            Test that a transition matrix with a row of zeros is rejected.
+            """
+            matrix = build_scale_transition_matrix(len(self.scale))
+            matrix[2] = 0.0
+            with self.assertRaises(ValueError):
+                StrangerNoteGeneratorMarkov(None, "lead", self.scale, matrix, [0.5], [1], [4], 4, 16)
+
+    # Run the tests
+    unittest.main()
@@ -0,0 +1,181 @@
+import heapq
+from stranger_note_generator import StrangerNoteGenerator
+
+
+class StrangerNoteGeneratorMerger(StrangerNoteGenerator):
+    """
+    A note generator that merges the note streams of several generators in time order.
+
+    Each generator may run on its own subdivision. A generator with subdivision 4 in a song
+    played on 16th notes only produces notes every fourth playback tick, so it is only woken
+    on those ticks: a heap keyed by the next due tick of every generator hands out exactly
+    the generators with due events. Note lengths are converted from the subdivision of the
+    generator to playback ticks.
+
+    A generator can only end the part on the last playback tick of its current step. The
+    part-end decisions of all generators are combined with `combine_part_end`.
+
+    Attributes:
+        _note_generators (list of StrangerNoteGenerator): The merged generators.
+        _tick_intervals (list of int): The number of playback ticks between calls of each generator.
+        _combine_part_end (callable): Combines the part-end decisions of all generators into one.
+        _heap (list of tuple): (next due tick, generator index) entries.
+        _next_due (list of int): The next due tick of each generator.
+        _part_ends (list of bool): The last part-end decision of each generator.
+        _tick (int): The current playback tick.
+    """
+
+    def __init__(self, control_params, note_generators, max_division=None, combine_part_end=all):
+        """
+        Initializes the StrangerNoteGeneratorMerger.
+
+        Args:
+            control_params (audio_engine.ControlParameters): An instance of ControlParameters.
+            note_generators (list of StrangerNoteGenerator): The generators to merge.
+            max_division (int, optional): The subdivision the playback ticks on. If None, every
+                generator is called on every tick.
+            combine_part_end (callable): Receives a list with one part-end decision per generator
+                and returns whether the part ends. Defaults to `all`.
+
+        Raises:
+            ValueError: If the subdivision of a generator does not divide `max_division`.
+        """
+        super().__init__(control_params)
+        self._note_generators = list(note_generators)
+        self._tick_intervals = [self._get_tick_interval(generator, max_division) for generator in self._note_generators]
+        self._combine_part_end = combine_part_end
+        self._heap = [(0, index) for index in range(len(self._note_generators))]
+        self._next_due = [0] * len(self._note_generators)
+        self._part_ends = [False] * len(self._note_generators)
+        self._tick = -1
+
+    @staticmethod
+    def _get_tick_interval(generator, max_division):
+        """
+        Computes the number of playback ticks between two calls of a generator.
+
+        Args:
+            generator (StrangerNoteGenerator): The generator.
+            max_division (int or None): The subdivision the playback ticks on.
+
+        Returns:
+            int: The tick interval.
+
+        Raises:
+            ValueError: If the subdivision of the generator does not divide `max_division`.
+        """
+        subdivision = generator.get_subdivision()
+        if subdivision is None or max_division is None:
+            return 1
+        if max_division % subdivision != 0:
+            raise ValueError(f"Subdivision {subdivision} does not divide the song's max division {max_division}.")
+        return max_division // subdivision
+
+    def get_tick_intervals(self):
+        """
+        Returns the number of playback ticks between the calls of each generator.
+
+        Returns:
+            list of int: The tick interval of each generator.
+        """
+        return self._tick_intervals
+
+    def get_next_notes(self):
+        """
+        Calls the generators that are due on the next playback tick and merges their notes.
+
+        Returns:
+            list: A list of dictionaries in the `StrangerNoteGenerator` note format.
+        """
+        self._tick += 1
+        tick = self._tick
+        heap = self._heap
+        notes = []
+
+        while heap and heap[0][0] <= tick:
+            _, index = heapq.heappop(heap)
+            generator = self._note_generators[index]
+            interval = self._tick_intervals[index]
+
+            generator_notes = generator.get_next_notes()
+            if interval != 1:
+                generator_notes = [dict(note, note_length=note["note_length"] * interval) for note in generator_notes]
+            notes.extend(generator_notes)
+
+            self._part_ends[index] = generator.get_part_end()
+            self._next_due[index] = tick + interval
+            heapq.heappush(heap, (tick + interval, index))
+
+        return notes
+
+    def get_part_can_end(self):
+        """
+        Combines the part-end decisions of all generators whose current step ends on this tick.
+
+        Returns:
+            bool: True if the part ends after this tick, False otherwise.
+        """
+        next_tick = self._tick + 1
+        return self._combine_part_end([
+            part_end and next_due == next_tick for part_end, next_due in zip(self._part_ends, self._next_due)
+        ])
+
+    def get_part_end(self):
+        """
+        Triggers a part transition once the combined part-end decision is True.
+
+        Returns:
+            bool: True if the part ends after this tick, False otherwise.
+        """
+        return self.get_part_can_end()
+
+
+# Unit test for StrangerNoteGeneratorMerger
+if __name__ == "__main__":
+    import unittest
+    from stranger_note_generator_bar_based import StrangerNoteGeneratorBarBased
+
+    class TestStrangerNoteGeneratorMerger(unittest.TestCase):
+        class CountingGenerator(StrangerNoteGeneratorBarBased):
+            def __init__(self, synth_name, beats_per_bar, subdivision):
+                super().__init__(None, beats_per_bar, 4, subdivision)
+                self.synth_name = synth_name
+                self.calls = 0
+
+            def _get_next_notes(self):
+                self.calls += 1
+                return [{"synth_name": self.synth_name, "event": "note_start", "pitch": 60,
+                         "amplitude": 0.5, "note_length": 1}]
+
+            def get_part_end(self):
+                return self.get_part_can_end()
+
+        def test_merge(self):
+            """
+            Test that generators are only called on their own subdivision and the part ends with the longest one.
+            """
+            drums = self.CountingGenerator("drums", [4], 16)  # One bar of 16th notes
+            bass = self.CountingGenerator("bass", [4, 4], 4)  # Two bars of quarter notes
+            merger = StrangerNoteGeneratorMerger(None, [drums, bass], max_division=16)
+            self.assertEqual(merger.get_tick_intervals(), [1, 4])
+
+            part_ends = []
+            for tick in range(64):
+                notes = merger.get_next_notes()
+                self.assertEqual([note["synth_name"] for note in notes], ["drums", "bass"] if tick % 4 == 0 else ["drums"])
+                self.assertEqual([note["note_length"] for note in notes], [1, 4] if tick % 4 == 0 else [1])
+                part_ends.append(merger.get_part_end())
+
+            self.assertEqual(drums.calls, 64)
+            self.assertEqual(bass.calls, 16)
+            self.assertEqual([tick for tick, part_end in enumerate(part_ends) if part_end], [31, 63])
+
+        def test_invalid_subdivision(self):
+            """
+            Test that subdivisions not dividing the max division are rejected.
+            """
+            with self.assertRaises(ValueError):
+                StrangerNoteGeneratorMerger(None, [self.CountingGenerator("lead", [4], 12)], max_division=16)
+
+    # Run the tests
+    unittest.main()
@@ -0,0 +1,251 @@
+import numpy as np
+from mido import MidiFile
+from stranger_note_generator_event_stream import EVENT_DTYPE, StrangerNoteGeneratorEventStream
+
+
+class StrangerNoteGeneratorMidiFile(StrangerNoteGeneratorEventStream):
+    """
+    A note generator that plays a MIDI file, e.g. one saved by `StrangerMidiRecorder`.
+
+    On load, the MIDI ticks of all notes are converted to subdivisions once and stored in
+    sorted arrays. An index of the first event of every subdivision and the start of every
+    bar makes retrieving the notes of a subdivision an O(1) slice and seeking to a bar or
+    looping a range of bars an O(log n) lookup.
+
+    Attributes:
+        _beats_per_bar (list of int): A list specifying the number of beats per bar for each bar in the sequence.
+        _note_value (int): The note value for the time signature (e.g., 4 for quarter notes, 8 for eighth notes).
+        _subdivision_offsets (numpy.ndarray): The index of the first event of every subdivision.
+        _bar_starts (numpy.ndarray): The first subdivision of every bar, followed by the stream length.
+    """
+
+    def __init__(self, control_params, filename, synth_names, beats_per_bar=(4,), note_value=4,
+                 subdivision=16, subdivisions_per_beat=None, loop=False):
+        """
+        Loads and indexes the MIDI file.
+
+        Args:
+            control_params (audio_engine.ControlParameters): An instance of ControlParameters.
+            filename (str): The path of the MIDI file.
+            synth_names (dict or list): Maps MIDI channels to synthesizer names. Notes on
+                channels without a synthesizer are skipped.
+            beats_per_bar (list of int): A list specifying the number of beats per bar for each bar in the sequence.
+            note_value (int): The note value for the time signature (e.g., 4 for quarter notes, 8 for eighth notes).
+            subdivision (int): The subdivision the file is played on (e.g., 16 for 16th notes).
+            subdivisions_per_beat (int, optional): The number of subdivisions per MIDI beat. Defaults to
+                `subdivision // 4`, as a MIDI beat is a quarter note.
+            loop (bool): Whether to restart from the beginning at the end of the file.
+        """
+        if not isinstance(synth_names, dict):
+            synth_names = dict(enumerate(synth_names))
+        if subdivisions_per_beat is None:
+            subdivisions_per_beat = subdivision // 4
+
+        midi_file = MidiFile(filename)
+        ticks_per_subdivision = midi_file.ticks_per_beat / subdivisions_per_beat
+        channel_synth_ids = {channel: synth_id for synth_id, channel in enumerate(synth_names)}
+
+        starts, synth_ids, pitches, velocities, ends = self._collect_notes(midi_file, channel_synth_ids)
+
+        start_subdivisions = np.rint(np.array(starts, dtype=np.float64) / ticks_per_subdivision).astype(np.int64)
+        end_subdivisions = np.rint(np.array(ends, dtype=np.float64) / ticks_per_subdivision).astype(np.int64)
+
+        events = np.zeros(len(starts), dtype=EVENT_DTYPE)
+        events["subdivision"] = start_subdivisions
+        events["synth_id"] = synth_ids
+        events["pitch"] = pitches
+        events["velocity"] = velocities
+        events["note_length"] = np.maximum(end_subdivisions - start_subdivisions, 1)
+        events = events[np.argsort(events["subdivision"], kind="stable")]
+
+        length = int((events["subdivision"] + events["note_length"]).max()) if len(events) > 0 else 0
+
+        self._beats_per_bar = list(beats_per_bar)
+        self._note_value = note_value
+        self._bar_starts = self._build_bar_starts(length, subdivision)
+        length = int(self._bar_starts[-1])  # Round the stream up to whole bars
+
+        super().__init__(control_params, events, list(synth_names.values()), length, loop)
+        self._subdivision_offsets = np.searchsorted(self._event_subdivisions, np.arange(length + 1), side="left")
+
+    def get_num_bars(self):
+        """
+        Returns the number of bars in the file.
+
+        Returns:
+            int: The number of bars.
+        """
+        return len(self._bar_starts) - 1
+
+    def get_bar(self, subdivision):
+        """
+        Returns the bar a subdivision belongs to.
+
+        Args:
+            subdivision (int): The subdivision index.
+
+        Returns:
+            int: The bar index (0 for the first bar).
+        """
+        return int(np.searchsorted(self._bar_starts, subdivision, side="right")) - 1
+
+    def seek(self, subdivision):
+        """
+        Moves playback so that the next call to `get_next_notes` returns the notes of `subdivision`.
+
+        Args:
+            subdivision (int): The subdivision index to continue playback from.
+        """
+        self._subdivision = subdivision - 1
+        self._position = int(self._subdivision_offsets[min(subdivision, self._length)])
+
+    def seek_bar(self, bar):
+        """
+        Moves playback to the start of a bar.
+
+        Args:
+            bar (int): The bar index (0 for the first bar).
+        """
+        self.seek(int(self._bar_starts[bar]))
+
+    def set_loop_bars(self, start_bar, end_bar):
+        """
+        Loops playback over a range of bars once playback reaches the end of the range.
+
+        Args:
+            start_bar (int): The first bar of the loop (0 for the first bar).
+            end_bar (int): The bar after the last one of the loop.
+        """
+        self.set_loop_range(int(self._bar_starts[start_bar]), int(self._bar_starts[end_bar]))
+
+    def _find_events_end(self, start, subdivision):
+        """
+        Looks up the end of the events of `subdivision` in the subdivision index.
+
+        Args:
+            start (int): The index of the first event of `subdivision`.
+            subdivision (int): The current subdivision.
+
+        Returns:
+            int: The index after the last event belonging to `subdivision`.
+        """
+        return int(self._subdivision_offsets[min(subdivision + 1, self._length)])
+
+    def _build_bar_starts(self, length, subdivision):
+        """
+        Computes the first subdivision of every bar needed to cover `length` subdivisions.
+
+        Args:
+            length (int): The number of subdivisions to cover.
+            subdivision (int): The subdivision the file is played on.
+
+        Returns:
+            numpy.ndarray: The first subdivision of every bar, followed by the end of the last bar.
+        """
+        bar_lengths = [beats * subdivision // self._note_value for beats in self._beats_per_bar]
+        bar_starts = [0]
+        while bar_starts[-1] < length or len(bar_starts) == 1:
+            bar_starts.append(bar_starts[-1] + bar_lengths[(len(bar_starts) - 1) % len(bar_lengths)])
+        return np.array(bar_starts, dtype=np.int64)
+
+    @staticmethod
+    def _collect_notes(midi_file, channel_synth_ids):
+        """
+        Pairs note-on and note-off messages of all tracks into notes with absolute tick times.
+
+        Args:
+            midi_file (mido.MidiFile): The loaded MIDI file.
+            channel_synth_ids (dict): A mapping of MIDI channels to synth ids.
+
+        Returns:
+            tuple: Lists of start ticks, synth ids, pitches, velocities and end ticks.
+        """
+        starts, synth_ids, pitches, velocities, ends = [], [], [], [], []
+        for track in midi_file.tracks:
+            tick = 0
+            open_notes = {}  # (channel, pitch) -> indices of sounding notes, oldest first
+            for message in track:
+                tick += message.time
+                if message.type not in ("note_on", "note_off") or message.channel not in channel_synth_ids:
+                    continue
+
+                key = (message.channel, message.note)
+                if message.type == "note_on" and message.velocity > 0:
+                    open_notes.setdefault(key, []).append(len(starts))
+                    starts.append(tick)
+                    synth_ids.append(channel_synth_ids[message.channel])
+                    pitches.append(message.note)
+                    velocities.append(message.velocity)
+                    ends.append(tick)
+                elif open_notes.get(key):
+                    ends[open_notes[key].pop(0)] = tick
+        return starts, synth_ids, pitches, velocities, ends
+
+
+# Unit test for StrangerNoteGeneratorMidiFile
+if __name__ == "__main__":
+    import os
+    import tempfile
+    import unittest
+    from mido import Message, MidiTrack
+
+    class TestStrangerNoteGeneratorMidiFile(unittest.TestCase):
+        def setUp(self):
+            # Two bars of 4/4 at 480 ticks per quarter note, played on 16th notes (120 ticks)
+            midi_file = MidiFile(ticks_per_beat=480)
+            track = MidiTrack()
+            midi_file.tracks.append(track)
+            track.append(Message("note_on", note=60, velocity=127, time=0, channel=0))
+            track.append(Message("note_on", note=36, velocity=64, time=0, channel=1))
+            track.append(Message("note_off", note=60, velocity=0, time=480, channel=0))
+            track.append(Message("note_on", note=62, velocity=100, time=1440, channel=0))
+            track.append(Message("note_off", note=36, velocity=0, time=0, channel=1))
+            track.append(Message("note_off", note=62, velocity=0, time=240, channel=0))
+            track.append(Message("note_on", note=99, velocity=100, time=0, channel=5))  # Unmapped channel
+
+            handle, self.filename = tempfile.mkstemp(suffix=".mid")
+            os.close(handle)
+            midi_file.save(self.filename)
+
+        def tearDown(self):
+            os.remove(self.filename)
+
+        def test_playback_and_seek(self):
+            """
+            Test the tick to subdivision conversion, bar index and seeking.
+            """
+            generator = StrangerNoteGeneratorMidiFile(None, self.filename, ["lead", "bass"])
+            self.assertEqual(generator.get_length(), 32)
+            self.assertEqual(generator.get_num_bars(), 2)
+            self.assertEqual(generator.get_bar(15), 0)
+            self.assertEqual(generator.get_bar(16), 1)
+
+            notes = [generator.get_next_notes() for _ in range(32)]
+            self.assertEqual([n["synth_name"] for n in notes[0]], ["lead", "bass"])
+            self.assertEqual(notes[0][0]["note_length"], 4)
+            self.assertEqual(notes[0][1]["note_length"], 16)
+            self.assertEqual(notes[16][0]["pitch"], 62)
+            self.assertEqual(notes[16][0]["note_length"], 2)
+            self.assertEqual(sum(len(n) for n in notes), 3)
+            self.assertTrue(generator.get_part_end())
+
+            generator.seek_bar(1)
+            self.assertEqual(generator.get_next_notes()[0]["pitch"], 62)
+
+        def test_loop_bars(self):
+            """
+            Test looping a range of bars.
+            """
+            generator = StrangerNoteGeneratorMidiFile(None, self.filename, {0: "lead"})
+            generator.set_loop_bars(1, 2)
+            generator.seek_bar(1)
+            played = [len(generator.get_next_notes()) for _ in range(48)]
+            self.assertEqual([i for i, n in enumerate(played) if n], [0, 16, 32])
+            self.assertTrue(generator.get_part_end())
+
+            # Seeking past the loop end wraps to the loop start
+            generator.seek(40)
+            self.assertEqual(generator.get_next_notes()[0]["pitch"], 62)
+
+    # Run the tests
+    unittest.main()
@@ -0,0 +1,105 @@
+import wave
+import numpy as np
+import audio_engine
+from stranger_song_scheduler import StrangerSongScheduler
+
+
+class StrangerOfflineRenderer:
+    """
+    A class to render a song to audio faster than real time, without an audio device.
+
+    The song is scheduled by the same `StrangerSongScheduler` as in `StrangerPlayback`, but
+    instead of waiting for a subdivision to be due, the frames up to it are taken from the tempo
+    map and rendered by the engine directly into a slice of the output array, so no audio is
+    copied between C++ and Python.
+
+    Attributes:
+        _song (StrangerSong): The song to be rendered.
+        _engine (AudioEngine): The audio engine used for offline rendering.
+        _synthesizers (dict): A dictionary of synthesizers registered with the audio engine.
+        _tempo_map (StrangerTempoMap): A copy of the song's tempo map with the part tempos of the current render.
+        _tracer (StrangerTracer): Records the duration of the scheduling phases, None if disabled.
+        _samples (numpy.ndarray): The output array of the current render, grown as needed.
+        _frame (int): The number of frames rendered into `_samples` so far.
+    """
+
+    def __init__(self, song, control_params, tracer=None):
+        """
+        Initializes the StrangerOfflineRenderer with a song and control parameters.
+
+        Args:
+            song (StrangerSong): The song to be rendered.
+            control_params (ControlParameters): The control parameters for the audio engine.
+            tracer (StrangerTracer, optional): Records the duration of each scheduling phase.
+                Tracing is disabled by default.
+        """
+        self._song = song
+        self._engine = audio_engine.AudioEngine(control_params)
+        self._synthesizers = song.get_synthesizers()
+        self._tempo_map = song.get_tempo_map()
+        self._tracer = tracer
+        self._samples = None
+        self._frame = 0
+
+        for synth_name, synth in self._synthesizers.items():
+            self._engine.registerSynth(synth_name, synth)
+        for bus, effect in song.get_effect_buses().items():
+            self._engine.setEffectBus(bus, effect)
+
+    def render(self, max_subdivisions):
+        """
+        Renders the song until it ends or `max_subdivisions` have been rendered.
+
+        Args:
+            max_subdivisions (int): The maximum number of subdivisions to render, as songs may not end.
+
+        Returns:
+            numpy.ndarray: The rendered mono float32 samples at `audio_engine.SAMPLE_RATE`.
+        """
+        self._tempo_map = self._song.get_tempo_map().copy()  # Part tempos must not carry over into the next render
+        scheduler = StrangerSongScheduler(self._song, self._engine.getSequencer(), self._tempo_map,
+                                          tracer=self._tracer)
+        self._samples = np.zeros(audio_engine.SAMPLE_RATE, dtype=np.float32)
+        self._frame = 0
+        end_subdivision = scheduler.run(self._render_until, max_subdivisions)
+        self._render_until(end_subdivision)  # The notes of the last subdivision still sound
+        samples = self._samples[:self._frame]
+        self._samples = None
+        return samples
+
+    def _render_until(self, subdivision):
+        """
+        Renders the frames up to the start of a subdivision.
+
+        Args:
+            subdivision (int): The subdivision index, placed on the timeline by the tempo map.
+
+        Returns:
+            bool: Always True, as offline rendering is never late.
+        """
+        end_frame = round(self._tempo_map.subdivision_to_seconds(subdivision) * audio_engine.SAMPLE_RATE)
+        if end_frame <= self._frame:
+            return True
+        if end_frame > len(self._samples):
+            self._samples = np.concatenate((self._samples, np.zeros(max(end_frame, 2 * len(self._samples))
+                                                                    - len(self._samples), dtype=np.float32)))
+        self._engine.render(self._samples[self._frame:end_frame])
+        self._frame = end_frame
+        return True
+
+    def render_to_wav(self, filename, max_subdivisions):
+        """
+        Renders the song and saves it as a 16-bit mono WAV file.
+
+        Args:
+            filename (str): The path of the WAV file.
+            max_subdivisions (int): The maximum number of subdivisions to render.
+        """
+        samples = self.render(max_subdivisions)
+        pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+        with wave.open(filename, "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(audio_engine.SAMPLE_RATE)
+            wav_file.writeframes(pcm.tobytes())
+        print(f"Audio file saved as {filename}.")
@@ -1,3 +1,6 @@
+from stranger_note_generator_merger import StrangerNoteGeneratorMerger
+
+
 class StrangerPart:
     """
     Base class for managing parts of a musical composition.
@@ -12,6 +15,10 @@ class StrangerPart:
     Interface:
         - get_part_name(): Returns the name of the current part.
         - get_note_generator(): Returns the note generator associated with the current part.
+        - get_note_generators(): Returns all note generators of the current part.
+        - combine_part_end(part_ends): Combines the part-end decisions of the note generators.
+        - get_tempo(): Returns the tempo the part is played at, or None to keep the current tempo.
+        - get_step_pattern(): Returns a fixed pattern played by the engine's step sequencer, or None.
     """
 
     def __init__(self, control_params):
@@ -46,3 +53,68 @@ class StrangerPart:
             NotImplementedError: If the method is not implemented in a subclass.
         """
         raise NotImplementedError("Subclasses must implement the `get_note_generator` method.")
+
+    def get_note_generators(self):
+        """
+        Retrieves all note generators of the current part, e.g. one each for drums, bass and lead.
+
+        Each generator may use its own meter and subdivision. Parts with a single generator
+        only need to implement `get_note_generator`.
+
+        Returns:
+            list of StrangerNoteGenerator: The note generators of the current part.
+        """
+        return [self.get_note_generator()]
+
+    def combine_part_end(self, part_ends):
+        """
+        Combines the part-end decisions of the note generators into the decision for the part.
+
+        Args:
+            part_ends (list of bool): For each generator, whether it can end the part after this tick.
+
+        Returns:
+            bool: True if the part ends, False otherwise. By default all generators have to agree.
+        """
+        return all(part_ends)
+
+    def get_tempo(self):
+        """
+        Returns the tempo the part is played at. It is entered into the tempo map of the song
+        at the subdivision where the part starts.
+
+        Returns:
+            float or None: The beats per minute, or None to keep the current tempo.
+        """
+        return None
+
+    def get_step_pattern(self):
+        """
+        Returns a fixed pattern for the part, which the playback uploads to the step sequencer
+        of the audio engine instead of calling the note generators on every subdivision.
+
+        Parts with a step pattern should still return a note generator playing it, e.g. a
+        `StrangerNoteGeneratorStepPattern`, for the offline renderer and the event file export.
+
+        Returns:
+            StrangerStepPattern or None: The pattern, or None to play the note generators.
+        """
+        return None
+
+    def get_merged_note_generator(self, max_division):
+        """
+        Returns a single note generator playing all note generators of the part in time order.
+
+        Args:
+            max_division (int or None): The subdivision the playback ticks on.
+
+        Returns:
+            StrangerNoteGenerator: The only generator of the part if it is called on every tick,
+            otherwise a `StrangerNoteGeneratorMerger` of all generators.
+        """
+        note_generators = self.get_note_generators()
+        if len(note_generators) == 1:
+            subdivision = note_generators[0].get_subdivision()
+            if subdivision is None or max_division is None or subdivision == max_division:
+                return note_generators[0]
+        return StrangerNoteGeneratorMerger(self._control_params, note_generators, max_division, self.combine_part_end)
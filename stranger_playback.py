@@ -1,44 +1,77 @@
 import time
+from datetime import datetime
 import audio_engine
 from stranger_midi_recorder import StrangerMidiRecorder
+from stranger_song_scheduler import StrangerSongScheduler
 
 
 class StrangerPlayback:
     """
-    A class to handle the playback of a song and record notes into a MIDI file.
+    A class to handle the playback of a song and record notes into a MIDI file, unless disabled.
 
     Attributes:
         _song (StrangerSong): The song to be played.
         _engine (AudioEngine): The audio engine for playback.
+        _owns_engine (bool): Whether the audio engine was created by and is only used by this playback.
+        _session (AudioSession): The session of this playback on a shared engine, None on an own engine.
         _synthesizers (dict): A dictionary of synthesizers registered with the audio engine.
-        _current_part (StrangerPart): The current part of the song being played.
-        _note_generator (StrangerNoteGenerator): The note generator for the current part.
+        _scheduler (StrangerSongScheduler): Starts the notes and switches the parts of the song on the playback clock.
+        _playback_start_time (float): The `time.perf_counter()` value at which the first subdivision was due.
         _is_playing (bool): Indicates whether playback is active.
-        _midi_recorder (StrangerMidiRecorder): The MIDI recorder for recording notes.
+        _tempo_map (StrangerTempoMap): A copy of the song's tempo map with the part tempos, driving the playback clock.
+        _midi_recorder (StrangerMidiRecorder): The MIDI recorder for recording notes, None if MIDI recording is disabled.
+        _record_audio (bool): Whether the synthesized audio is recorded to a WAV file.
     """
 
-    def __init__(self, song, control_params):
+    def __init__(self, song, control_params, record_audio=False, engine=None, session_name=None, tracer=None,
+                 record_midi=True):
         """
         Initializes the StrangerPlayback with a song and control parameters.
 
         Args:
             song (StrangerSong): The song to be played.
             control_params (ControlParameters): The control parameters for the audio engine.
+            record_audio (bool): Whether to record the engine output to a WAV file. Only a playback
+                with its own engine records, a shared engine is recorded by its owner.
+            engine (AudioEngine, optional): A shared audio engine to play on. The song then gets its
+                own session on that engine. By default the playback creates its own engine.
+            session_name (str, optional): The name of the session on a shared engine. Defaults to
+                the class name of the song.
+            tracer (StrangerTracer, optional): Records the duration of each phase of the playback
+                loop. Tracing is disabled by default.
+            record_midi (bool): Whether to record the played notes to a MIDI file.
+
+        Raises:
+            ValueError: If `record_audio` is set for a shared engine.
         """
+        self._is_playing = False
+        if record_audio and engine is not None:
+            raise ValueError("The recording of a shared engine is started and stopped by its owner.")
         self._song = song
-        self._engine = audio_engine.AudioEngine(control_params)
+        self._owns_engine = engine is None
+        if self._owns_engine:
+            self._engine = audio_engine.AudioEngine(control_params)
+            self._session = None
+        else:
+            self._engine = engine
+            self._session = engine.createSession(session_name or song.__class__.__name__, control_params)
         self._synthesizers = song.get_synthesizers()
-        self._current_part = None
-        self._note_generator = None
-        self._is_playing = False
+        self._record_audio = record_audio
+        self._playback_start_time = None
 
         # Initialize MIDI recorder
-        bpm = 60 / song.get_update_interval()  # Convert update interval to BPM
-        self._midi_recorder = StrangerMidiRecorder(bpm)
+        self._tempo_map = song.get_tempo_map().copy()  # Part tempos must not carry over into the next playback
+        self._midi_recorder = StrangerMidiRecorder(self._tempo_map) if record_midi else None
 
         # Register synthesizers with the audio engine
+        synth_target = self._engine if self._session is None else self._session
         for synth_name, synth in self._synthesizers.items():
-            self._engine.registerSynth(synth_name, synth)
+            synth_target.registerSynth(synth_name, synth)
+        if self._owns_engine:  # The effect buses of a shared engine are set up by its owner
+            for bus, effect in song.get_effect_buses().items():
+                self._engine.setEffectBus(bus, effect)
+        self._scheduler = StrangerSongScheduler(song, synth_target.getSequencer(), self._tempo_map,
+                                                self._midi_recorder, tracer)
 
     def __del__(self):
         """
@@ -46,79 +79,75 @@ class StrangerPlayback:
         """
         self.stop_playback()
 
+    def get_session(self):
+        """
+        Returns the session of this playback on a shared engine.
+
+        Returns:
+            AudioSession or None: The session, or None if the playback uses its own engine.
+        """
+        return self._session
+
     def start_playback(self):
         """
         Starts the playback of the song.
+
+        Blocks until the song ends. To play several songs on a shared engine, run the
+        playback of each song in its own thread.
         """
         self._engine.start()
-        self._current_part = self._song.get_next_part()
-        self._note_generator = self._current_part.get_note_generator()
+        if self._record_audio:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            self._engine.startRecording(f"{self._song.__class__.__name__}_{timestamp}.wav")
         self._is_playing = True
 
         print("Starting playback...")
-        future_note_off_events = []
-
-        while self._is_playing:
-            loop_start_time = time.time()
-
-            # Process future note off events
-            for event in future_note_off_events[:]:
-                event["remaining_subdivisions"] -= 1
-                if event["remaining_subdivisions"] <= 0:
-                    self._synthesizers[event["synth_name"]].stopNote()
-                    self._midi_recorder.record_note_off(event["synth_name"], event["pitch"])
-                    future_note_off_events.remove(event)
-
-            # Get the next set of notes from the note generator
-            notes = self._note_generator.get_next_notes()
-
-            # Process note_start events
-            for note_event in notes:
-                synth_name = note_event["synth_name"]
-                pitch = note_event["pitch"]
-                amplitude = note_event["amplitude"]
-                note_length = note_event["note_length"]
-
-                # Start the note
-                self._synthesizers[synth_name].startNote(pitch, amplitude)
-                self._midi_recorder.record_note_on(synth_name, pitch, amplitude)
-
-                # Schedule the note off event
-                future_note_off_events.append({
-                    "synth_name": synth_name,
-                    "pitch": pitch,
-                    "remaining_subdivisions": note_length,
-                })
-
-            # Check if the part has ended and transition if necessary
-            if self._note_generator.get_part_end():
-                next_part = self._song.get_next_part()
-                if next_part == "end":
-                    print("Song has ended.")
-                    self.stop_playback()
-                    break
-                elif next_part is not None:  # Repeat current part on None
-                    print(f"Transitioning to part: {next_part.get_part_name()}")
-                    self._current_part = next_part
-                    self._note_generator = self._current_part.get_note_generator()
-
-            loop_stop_time = time.time()
-            sleep_duration = self._song.get_update_interval() - (loop_stop_time - loop_start_time)
-
-            # Wait for the duration of the update interval before the next iteration
-            if sleep_duration > 0:
-                time.sleep(sleep_duration)
-            else:
-                print("Warning: Loop took longer than the update interval.")
+        self._playback_start_time = time.perf_counter()
+        self._scheduler.run(self._wait_for_subdivision)
+        self.stop_playback()
+
+    def _wait_for_subdivision(self, subdivision):
+        """
+        Sleeps until a subdivision is due on the playback clock.
+
+        Args:
+            subdivision (int): The subdivision index, placed on the clock by the tempo map.
+
+        Returns:
+            bool: False if the subdivision was already overdue.
+        """
+        sleep_duration = (self._playback_start_time + self._tempo_map.subdivision_to_seconds(subdivision)
+                          - time.perf_counter())
+        if sleep_duration <= 0:
+            return False
+        time.sleep(sleep_duration)
+        return True
 
     def stop_playback(self):
         """
-        Stops the playback of the song and saves the MIDI file.
+        Stops the playback of the song and saves the MIDI file and the audio recording, if enabled.
         """
         if self._is_playing:
             self._is_playing = False
-            self._engine.stop()
+            self._scheduler.stop()
+            callback_stats = self._engine.getCallbackStats()
+            if callback_stats["load_shedding_transition_count"] > 0:
+                print(f"Warning: The engine degraded rendering {callback_stats['load_shedding_transition_count']} "
+                      f"times under load (max load {callback_stats['max_load']:.0%}).")
+            if self._owns_engine:
+                self._engine.stop()
+            else:
+                self._engine.removeSession(self._session.getName())
             print("Playback stopped.")
 
+            if self._record_audio:
+                self._engine.stopRecording()
+                stats = self._engine.getRecordingStats()
+                print(f"Audio recording saved ({stats['frames_written']} frames).")
+                if stats["overrun_frames"] > 0:
+                    print(f"Warning: Disk writer fell behind, {stats['overrun_frames']} frames were dropped "
+                          f"in {stats['overrun_blocks']} blocks.")
+
             # Save the MIDI file
-            self._midi_recorder.save(self._song.__class__.__name__)
+            if self._midi_recorder is not None:
+                self._midi_recorder.save(self._song.__class__.__name__)
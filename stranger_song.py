@@ -1,3 +1,6 @@
+from stranger_tempo_map import StrangerTempoMap
+
+
 class StrangerSong:
     """
     Base class for managing a song composed of synthesizers and musical parts.
@@ -8,10 +11,13 @@ class StrangerSong:
     Attributes:
         _control_params (audio_engine.ControlParameters): An instance of ControlParameters
             for managing and updating synthesizer parameters.
+        _tempo_map (StrangerTempoMap): The tempo map of the song, built on first use if not set by a subclass.
         
     Interface:
         - get_synthesizers(): Returns a dictionary of synthesizer names and their corresponding SynthWrapper instances.
         - get_update_interval(): Returns the minimum note duration (update interval) in seconds.
+        - get_tempo_map(): Returns the tempo map converting between subdivisions and seconds.
+        - get_effect_buses(): Returns the effects on the shared effect buses of the engine.
         - get_next_part(current_part_name): Returns the name of the next part based on the current part.
     """
 
@@ -24,6 +30,7 @@ class StrangerSong:
         """
         self._control_params = control_params
         self._current_part_index = 0
+        self._tempo_map = None
 
     def get_synthesizers(self):
         """
@@ -49,6 +56,39 @@ class StrangerSong:
         """
         raise NotImplementedError("Subclasses must implement the `get_update_interval` method.")
 
+    def get_tempo_map(self):
+        """
+        Returns the tempo map of the song, shared by the playback clock and the MIDI recorder.
+
+        By default, a constant tempo map is built from `get_update_interval`, with one
+        subdivision per beat.
+
+        Returns:
+            StrangerTempoMap: The tempo map of the song.
+        """
+        if self._tempo_map is None:
+            self._tempo_map = StrangerTempoMap(60 / self.get_update_interval(), 4)
+        return self._tempo_map
+
+    def get_effect_buses(self):
+        """
+        Returns the effects on the shared effect buses of the engine. Synths feed a bus with
+        `setSend(bus, level)` and each effect runs once per block on everything sent to it.
+
+        Returns:
+            dict: A mapping of bus indices (int) to effects (e.g., audio_engine.ReverbEffect), empty by default.
+        """
+        return {}
+
+    def get_max_division(self):
+        """
+        Returns the subdivision grid the song is played on (e.g., 16 for 16th notes).
+
+        Returns:
+            int or None: The maximum division of the song, or None if it is not known.
+        """
+        return None
+
     def get_next_part(self):
         """
         Determines the next part of the song by incrementing the part counter and calling the subclass implementation.
@@ -87,6 +127,8 @@ class StrangerBPMSong(StrangerSong):
     """
     Subclass of StrangerSong that calculates the update interval based on BPM and max division.
 
+    The tempo map starts at `bpm`; tempo changes, accelerandos and ritardandos can be added to it.
+
     Attributes:
         _bpm (float): Beats per minute for the song.
         _max_division (int): Maximum division for note duration (e.g., 16 for 16th notes).
@@ -104,12 +146,38 @@ class StrangerBPMSong(StrangerSong):
         super().__init__(control_params)
         self._bpm = bpm
         self._max_division = max_division
+        self._tempo_map = StrangerTempoMap(bpm, max_division)
 
     def get_update_interval(self):
         """
-        Calculates the minimum note duration (update interval) based on BPM and max division.
+        Calculates the minimum note duration (update interval) based on the initial BPM and max division.
 
         Returns:
             float: The minimum note duration in seconds.
         """
         return 60 / self._bpm / (self._max_division / 4)
+
+    def get_max_division(self):
+        """
+        Returns the maximum division the song is played on.
+
+        Returns:
+            int: The maximum division for note duration (e.g., 16 for 16th notes).
+        """
+        return self._max_division
+
+
+# Unit test for StrangerSong
+if __name__ == "__main__":
+    import unittest
+
+    class TestStrangerSong(unittest.TestCase):
+        def test_effect_buses(self):
+            """
+            Test that songs have no effect buses unless a subclass sets them up.
+            """
+            self.assertEqual(StrangerSong(None).get_effect_buses(), {})
+            self.assertEqual(StrangerBPMSong(None, 120, 16).get_effect_buses(), {})
+
+    # Run the tests
+    unittest.main()
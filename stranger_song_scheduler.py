@@ -0,0 +1,500 @@
+class StrangerSongScheduler:
+    """
+    A class to walk a song subdivision by subdivision, starting its notes and switching its parts.
+
+    Parts with note generators are played from Python, parts with a step pattern are played by
+    the step sequencer of the engine while their events are handled here, only on the steps that
+    need it. The scheduler does not keep time itself: `run` hands each subdivision it schedules to
+    a callback that advances the engine to it, which `StrangerPlayback` does by sleeping until the
+    subdivision is due and `StrangerOfflineRenderer` by rendering the frames up to it.
+
+    Attributes:
+        _song (StrangerSong): The song to be scheduled.
+        _synthesizers (dict): A dictionary of synthesizers registered with the audio engine.
+        _sequencer (StepSequencer): The step sequencer of the engine or session, playing the step pattern parts.
+        _tempo_map (StrangerTempoMap): The tempo map the part tempos are entered into, not shared with the song.
+        _midi_recorder (StrangerMidiRecorder): The MIDI recorder for recording notes, None if MIDI recording is disabled.
+        _tracer (StrangerTracer): Records the duration of the scheduling phases, None if disabled.
+        _current_part (StrangerPart): The current part of the song being played.
+        _note_generator (StrangerNoteGenerator): The note generator for the current part, None for a step pattern part.
+        _step_pattern (StrangerStepPattern): The step pattern of the current part, None if it plays note generators.
+        _sequencer_patterns (dict): The uploaded step patterns and their native patterns by pattern id.
+        _sequencer_started (bool): Whether the step pattern of the current part has been started.
+        _sequencer_playing (tuple): The step pattern and native pattern the sequencer plays, and the
+            subdivision on which its current repetitions started.
+        _sequencer_pattern_id (int): The id of the native pattern the sequencer plays.
+        _sequencer_next_part (StrangerPart or str): The part decided for after the playing step pattern, or "end".
+        _sequencer_next_pattern (StrangerStepPattern): The step pattern queued for the next part, if it has one.
+        _sequencer_switch_step (int): The subdivision on which the sequencer switches to the decided part.
+        _sequencer_draining (bool): Whether the sequencer has finished its patterns but still releases notes.
+        _pending_note_offs (list): The ended notes of the note generators whose note offs are not recorded yet.
+        _is_running (bool): Indicates whether the song is being scheduled.
+    """
+
+    def __init__(self, song, sequencer, tempo_map, midi_recorder=None, tracer=None):
+        """
+        Initializes the StrangerSongScheduler with a song and the sequencer of its engine.
+
+        Args:
+            song (StrangerSong): The song to be scheduled. Its synthesizers must be registered
+                with the engine or session of `sequencer`.
+            sequencer (StepSequencer): The step sequencer playing the step pattern parts.
+            tempo_map (StrangerTempoMap): The tempo map to enter the part tempos into. Pass a
+                copy of the song's tempo map, so part tempos do not carry over into the next run.
+            midi_recorder (StrangerMidiRecorder, optional): Records the played notes.
+            tracer (StrangerTracer, optional): Records the duration of each scheduling phase.
+        """
+        self._song = song
+        self._synthesizers = song.get_synthesizers()
+        self._sequencer = sequencer
+        self._tempo_map = tempo_map
+        self._midi_recorder = midi_recorder
+        self._tracer = tracer
+        self._current_part = None
+        self._note_generator = None
+        self._step_pattern = None
+        self._sequencer_patterns = {}
+        self._sequencer_started = False
+        self._sequencer_playing = None
+        self._sequencer_pattern_id = None
+        self._sequencer_next_part = None
+        self._sequencer_next_pattern = None
+        self._sequencer_switch_step = None
+        self._sequencer_draining = False
+        self._pending_note_offs = []
+        self._is_running = False
+        self._sequencer.setReportNotes(midi_recorder is not None)  # Note events are only needed for the MIDI recording
+
+    def run(self, advance, max_subdivisions=None):
+        """
+        Schedules the song until it ends, `stop` is called or `max_subdivisions` have been scheduled.
+
+        Args:
+            advance (callable): Called with a subdivision index to advance the engine to the start
+                of that subdivision. Returns False if the subdivision was already overdue.
+            max_subdivisions (int, optional): The maximum number of subdivisions to schedule.
+
+        Returns:
+            int: The subdivision after the last one that was scheduled.
+        """
+        self._enter_part(self._song.get_next_part(), 0)
+        self._is_running = True
+
+        future_note_off_events = []
+        tracer = self._tracer
+        trace = tracer is not None
+        part_name = self._current_part.get_part_name() if trace else None
+        subdivision = 0
+
+        while self._is_running and (max_subdivisions is None or subdivision < max_subdivisions):
+            if trace:
+                tick_start = phase_start = tracer.now()
+
+            # Process future note off events
+            ended_note_events = []
+            remaining_note_events = []
+            for event in future_note_off_events:
+                if event["end_subdivision"] <= subdivision:
+                    ended_note_events.append(event)
+                else:
+                    remaining_note_events.append(event)
+            future_note_off_events = remaining_note_events
+            if trace:
+                phase_start = tracer.record("note_off_scan", phase_start, part_name, subdivision)
+
+            for event in ended_note_events:
+                self._synthesizers[event["synth_name"]].stopNote()
+            if trace:
+                phase_start = tracer.record("note_off_engine", phase_start, part_name, subdivision)
+
+            if self._midi_recorder is not None:
+                # Recorded after the sequencer events of the steps before, which may only be polled now
+                self._pending_note_offs.extend(ended_note_events)
+
+            if self._step_pattern is not None:
+                # The engine plays the pattern, only its events are handled here
+                subdivision = self._process_sequencer_events(subdivision)
+                if self._note_generator is not None:
+                    # The sequencer finished on `subdivision`, the next part starts once it is due
+                    advance(subdivision)
+                if trace:
+                    phase_start = tracer.record("sequencer_events", phase_start, part_name, subdivision)
+
+            if self._step_pattern is None and self._sequencer_draining:
+                self._drain_sequencer_events()
+                if trace:
+                    phase_start = tracer.record("sequencer_events", phase_start, part_name, subdivision)
+
+            if self._midi_recorder is not None:
+                self._record_note_offs()
+            if trace:
+                phase_start = tracer.record("note_off_midi", phase_start, part_name, subdivision)
+
+            if self._note_generator is not None:
+                # Get the next set of notes from the note generator
+                notes = self._note_generator.get_next_notes()
+                if trace:
+                    phase_start = tracer.record("get_next_notes", phase_start, part_name, subdivision)
+
+                # Process note_start events
+                for note_event in notes:
+                    synth_name = note_event["synth_name"]
+                    pitch = note_event["pitch"]
+
+                    # Start the note
+                    self._synthesizers[synth_name].startNote(pitch, note_event["amplitude"])
+
+                    # Schedule the note off event
+                    future_note_off_events.append({
+                        "synth_name": synth_name,
+                        "pitch": pitch,
+                        "end_subdivision": subdivision + note_event["note_length"],
+                    })
+                if trace:
+                    phase_start = tracer.record("note_on_engine", phase_start, part_name, subdivision)
+
+                if self._midi_recorder is not None:
+                    for note_event in notes:
+                        self._midi_recorder.record_note_on(note_event["synth_name"], note_event["pitch"],
+                                                           note_event["amplitude"], subdivision)
+                if trace:
+                    phase_start = tracer.record("note_on_midi", phase_start, part_name, subdivision)
+
+                # Check if the part has ended and transition if necessary
+                if self._note_generator.get_part_end():
+                    next_part = self._song.get_next_part()
+                    if next_part == "end":
+                        print("Song has ended.")
+                        subdivision += 1  # The notes of this subdivision still sound
+                        break
+                    elif next_part is not None:  # Repeat current part on None
+                        print(f"Transitioning to part: {next_part.get_part_name()}")
+                        self._enter_part(next_part, subdivision + 1)
+                    if trace:
+                        tracer.record("part_transition", phase_start, part_name, subdivision)
+            elif self._step_pattern is None and not self._sequencer_draining:
+                # The song ended with a step pattern and the sequencer has released its last notes
+                print("Song has ended.")
+                break
+            if trace:
+                tracer.record("tick", tick_start, part_name, subdivision)
+
+            # The next subdivision is due at its position in the tempo map, so loop jitter does not accumulate
+            last_subdivision = subdivision
+            subdivision = self._get_next_subdivision(subdivision, future_note_off_events)
+            if max_subdivisions is not None:
+                subdivision = min(subdivision, max_subdivisions)
+            if not advance(subdivision):
+                print("Warning: Loop took longer than the update interval.")
+                if trace:
+                    tracer.record_instant("loop_overrun", part_name, last_subdivision)
+            if trace:
+                # The tick that changed parts belongs to the part it ended
+                part_name = self._current_part.get_part_name()
+
+        self._is_running = False
+        return subdivision
+
+    def stop(self):
+        """
+        Stops scheduling, `run` returns after the current subdivision.
+        """
+        self._is_running = False
+
+    def _get_next_subdivision(self, subdivision, future_note_off_events):
+        """
+        Returns the next subdivision that needs scheduling.
+
+        Parts with note generators need every subdivision. While the sequencer plays a step
+        pattern, the subdivisions in between are skipped, up to the next note off of a part
+        with note generators before it.
+
+        Args:
+            subdivision (int): The subdivision that was scheduled.
+            future_note_off_events (list): The notes started by note generators that still play.
+
+        Returns:
+            int: The next subdivision to schedule.
+        """
+        if self._step_pattern is None or not self._sequencer_started:
+            return subdivision + 1
+        next_subdivision = self._get_sequencer_wake_step(subdivision)
+        for event in future_note_off_events:
+            next_subdivision = min(next_subdivision, event["end_subdivision"])
+        return max(next_subdivision, subdivision + 1)
+
+    def _get_sequencer_wake_step(self, subdivision):
+        """
+        Returns the next subdivision on which the events of the sequencer need handling.
+
+        These are the steps after a dynamic note was played, so it is refilled right away, the
+        step after the last repetition started, so the next part is decided in time, and the step
+        on which the sequencer switches to the decided part. The events are handled at least once
+        per pattern length, so the event queue does not fill up with note events.
+
+        Args:
+            subdivision (int): The subdivision that was scheduled.
+
+        Returns:
+            int: The subdivision to handle the events of the sequencer on next.
+        """
+        pattern, native_pattern, start_step = self._sequencer_playing
+        num_steps = native_pattern.getNumSteps()
+        scale = num_steps // pattern.get_num_steps()
+        position = (subdivision - start_step) % num_steps
+        wake_step = subdivision + num_steps
+        for note in pattern.get_notes():
+            if note["dynamic"]:
+                wake_step = min(wake_step, subdivision + (note["step"] * scale - position) % num_steps + 1)
+
+        repetitions = native_pattern.getRepetitions()
+        if self._sequencer_next_part is not None:
+            # Once the switch is overdue, its event is waited for step by step
+            wake_step = min(wake_step, max(self._sequencer_switch_step, subdivision + 1))
+        elif repetitions > 0:
+            # The pattern repeats by itself until the next part is decided
+            cycle = repetitions * num_steps
+            part_ending_step = subdivision - (subdivision - start_step) % cycle + cycle - num_steps
+            if part_ending_step < subdivision:
+                part_ending_step += cycle
+            wake_step = min(wake_step, part_ending_step + 1)
+        return wake_step
+
+    def _enter_part(self, part, subdivision):
+        """
+        Makes a part the current part, either with its note generator or its step pattern.
+
+        Args:
+            part (StrangerPart): The part that starts.
+            subdivision (int): The subdivision index at which the part starts.
+        """
+        self._current_part = part
+        self._apply_part_tempo(part, subdivision)
+        self._step_pattern = part.get_step_pattern()
+        self._sequencer_started = False
+        if self._step_pattern is None:
+            self._note_generator = part.get_merged_note_generator(self._song.get_max_division())
+        else:
+            self._note_generator = None
+
+    def _upload_step_pattern(self, pattern):
+        """
+        Builds the native pattern of a step pattern and remembers both to handle its events.
+
+        Args:
+            pattern (StrangerStepPattern): The step pattern.
+
+        Returns:
+            audio_engine.StepPattern: The native pattern.
+        """
+        native_pattern = pattern.build(self._synthesizers, self._song.get_max_division())
+        self._sequencer_patterns[native_pattern.getId()] = (pattern, native_pattern)
+        return native_pattern
+
+    def _process_sequencer_events(self, subdivision):
+        """
+        Starts the step pattern of the current part and handles the events of the sequencer.
+
+        Dynamic notes are refilled right after the engine played them. When the last repetition
+        of a pattern starts, the next part is decided, so the sequencer can switch to its pattern
+        without a gap. A part with note generators takes over on the step after the last pattern,
+        while the notes the sequencer still releases are handled by `_drain_sequencer_events`.
+        At the end of the song, no part takes over and only the release of the notes remains.
+
+        Args:
+            subdivision (int): The subdivision of the scheduling clock.
+
+        Returns:
+            int: The subdivision of the scheduling clock, moved to where the sequencer finished if it did.
+        """
+        if not self._sequencer_started:
+            native_pattern = self._upload_step_pattern(self._step_pattern)
+            self._update_sequencer_tempo()
+            self._sequencer.start(native_pattern, subdivision)
+            self._sequencer_playing = (self._step_pattern, native_pattern, subdivision)
+            self._sequencer_started = True
+            self._sequencer_draining = False
+
+        stopped_step = None
+        for event in self._sequencer.pollEvents():
+            if event["type"] == "stopped":
+                stopped_step = event["step"]
+            else:
+                self._handle_sequencer_event(event)
+        if stopped_step is None:
+            return subdivision
+
+        # Notes still playing are released by the sequencer in the following steps, their events
+        # are recorded until it stops running
+        self._sequencer_draining = True
+        next_part, self._sequencer_next_part = self._sequencer_next_part, None
+        if next_part == "end":
+            self._step_pattern = None
+            return subdivision
+        print(f"Transitioning to part: {next_part.get_part_name()}")
+        self._enter_part(next_part, stopped_step)
+        return stopped_step
+
+    def _drain_sequencer_events(self):
+        """
+        Handles the note events of a sequencer that has finished its patterns, until it stops running.
+        """
+        finished = not self._sequencer.isRunning()
+        for event in self._sequencer.pollEvents():
+            self._handle_sequencer_event(event)
+        if finished:
+            self._sequencer_draining = False
+
+    def _handle_sequencer_event(self, event):
+        """
+        Handles an event of the sequencer other than "stopped".
+
+        Args:
+            event (dict): The event as returned by `pollEvents`.
+        """
+        event_type = event["type"]
+        pattern, native_pattern = self._sequencer_patterns.get(event["pattern"], (None, None))
+        # Note events are only reported while MIDI recording is enabled
+        if event_type in ("note_on", "note_off") and pattern is not None:
+            self._record_note_offs(event["step"])
+        if event_type == "note_on" and pattern is not None:
+            self._midi_recorder.record_note_on(pattern.get_notes()[event["note"]]["synth_name"], event["pitch"],
+                                               event["amplitude"], event["step"])
+        elif event_type == "note_off" and pattern is not None:
+            self._midi_recorder.record_note_off(pattern.get_notes()[event["note"]]["synth_name"], event["pitch"],
+                                                event["step"])
+        elif event_type == "dynamic_note" and pattern is not None:
+            pattern.update_dynamic_note(native_pattern, event["note"])
+        elif event_type == "pattern_started":
+            if pattern is not None:
+                self._sequencer_playing = (pattern, native_pattern, event["step"])
+            if pattern is not None and pattern is self._sequencer_next_pattern:
+                print(f"Transitioning to part: {self._sequencer_next_part.get_part_name()}")
+                self._current_part = self._sequencer_next_part
+                self._step_pattern = pattern
+                self._sequencer_next_part = None
+                self._sequencer_next_pattern = None
+            if event["pattern"] != self._sequencer_pattern_id:
+                # Only the previous pattern may still release notes, forget the ones before it
+                previous_id, self._sequencer_pattern_id = self._sequencer_pattern_id, event["pattern"]
+                self._sequencer_patterns = {pattern_id: entry for pattern_id, entry in self._sequencer_patterns.items()
+                                            if previous_id is None or pattern_id >= previous_id}
+        elif event_type == "part_ending" and self._sequencer_next_part is None:
+            self._decide_part_after_pattern(event["step"] + native_pattern.getNumSteps())
+
+    def _record_note_offs(self, step=None):
+        """
+        Records the note offs of the note generators that are due, so the MIDI events stay in order.
+
+        Args:
+            step (int, optional): Only the note offs up to and including this step are recorded.
+                By default all note offs are recorded.
+        """
+        remaining_note_events = []
+        for event in self._pending_note_offs:
+            if step is None or event["end_subdivision"] <= step:
+                self._midi_recorder.record_note_off(event["synth_name"], event["pitch"], event["end_subdivision"])
+            else:
+                remaining_note_events.append(event)
+        self._pending_note_offs = remaining_note_events
+
+    def _decide_part_after_pattern(self, subdivision):
+        """
+        Asks the song for the part after the playing step pattern and prepares the sequencer for it.
+
+        Args:
+            subdivision (int): The subdivision at which the next part starts.
+        """
+        next_part = self._song.get_next_part()
+        if next_part is None:  # Repeat current part on None, the sequencer does so by itself
+            return
+        self._sequencer_next_part = next_part
+        self._sequencer_switch_step = subdivision
+        if next_part == "end":
+            self._sequencer.finish()
+            return
+
+        self._apply_part_tempo(next_part, subdivision)
+        pattern = next_part.get_step_pattern()
+        self._sequencer_next_pattern = pattern
+        if pattern is None:
+            self._sequencer.finish()
+        else:
+            self._sequencer.queuePattern(self._upload_step_pattern(pattern))
+
+    def _apply_part_tempo(self, part, subdivision):
+        """
+        Enters the tempo of a part into the tempo map at the subdivision where the part starts.
+
+        Args:
+            part (StrangerPart): The part that starts.
+            subdivision (int): The subdivision index at which the part starts.
+        """
+        bpm = part.get_tempo()
+        if bpm is not None:
+            self._tempo_map.set_tempo(subdivision, bpm)
+            self._update_sequencer_tempo()
+
+    def _update_sequencer_tempo(self):
+        """
+        Hands the tempo map to the sequencer, which times the steps of the patterns with it.
+        """
+        self._sequencer.setTempo([(subdivision, self._tempo_map.get_subdivision_duration(subdivision))
+                                  for subdivision, _ in self._tempo_map.get_tempo_changes()])
+
+
+# Unit test for StrangerSongScheduler
+if __name__ == "__main__":
+    import unittest
+    from stranger_step_pattern import StrangerStepPattern
+
+    class FakeSong:
+        def get_synthesizers(self):
+            return {}
+
+    class FakeSequencer:
+        def setReportNotes(self, enabled):
+            pass
+
+    class FakeNativePattern:
+        def __init__(self, num_steps, repetitions):
+            self._num_steps = num_steps
+            self._repetitions = repetitions
+
+        def getNumSteps(self):
+            return self._num_steps
+
+        def getRepetitions(self):
+            return self._repetitions
+
+    class TestStrangerSongScheduler(unittest.TestCase):
+        def test_sequencer_wake_step(self):
+            """
+            Test that the scheduler wakes after dynamic notes, the last repetition and at the switch.
+            """
+            pattern = StrangerStepPattern([4], 4, 4, repetitions=2)
+            pattern.add_note(1, "lead", 0, 0.0, 1, dynamic=True)
+            scheduler = StrangerSongScheduler(FakeSong(), FakeSequencer(), None)
+            # Built for eighth notes, the dynamic note plays on steps 12, 20 and 28
+            scheduler._sequencer_playing = (pattern, FakeNativePattern(8, 2), 10)
+            self.assertEqual(scheduler._get_sequencer_wake_step(10), 13)
+            self.assertEqual(scheduler._get_sequencer_wake_step(13), 19)  # The last repetition starts on 18
+            self.assertEqual(scheduler._get_sequencer_wake_step(19), 21)
+
+            scheduler._sequencer_next_part = "end"
+            scheduler._sequencer_switch_step = 26
+            self.assertEqual(scheduler._get_sequencer_wake_step(21), 26)
+            self.assertEqual(scheduler._get_sequencer_wake_step(27), 28)
+
+        def test_sequencer_wake_step_without_events(self):
+            """
+            Test that a pattern repeating forever without dynamic notes is still polled once per repetition.
+            """
+            pattern = StrangerStepPattern([4], 4, 4, repetitions=0)
+            pattern.add_note(0, "bass", 36, 1.0, 1)
+            scheduler = StrangerSongScheduler(FakeSong(), FakeSequencer(), None)
+            scheduler._sequencer_playing = (pattern, FakeNativePattern(4, 0), 0)
+            self.assertEqual(scheduler._get_sequencer_wake_step(5), 9)
+
+    # Run the tests
+    unittest.main()
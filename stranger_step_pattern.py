@@ -0,0 +1,308 @@
+from stranger_note_generator import StrangerNoteGenerator
+
+
+class StrangerStepPattern:
+    """
+    A fixed pattern of notes that is uploaded to the step sequencer of the audio engine.
+
+    Once uploaded, the pattern plays on the audio thread without any Python work per step.
+    Notes added with `dynamic=True` take their pitch and amplitude from `get_dynamic_note`:
+    it is called when the pattern is built and again each time the engine has played the
+    note, so every repetition can play a new value.
+
+    Attributes:
+        _beats_per_bar (list of int): A list specifying the number of beats per bar for each bar in the pattern.
+        _note_value (int): The note value for the time signature (e.g., 4 for quarter notes).
+        _subdivision (int): The subdivision the steps are counted in (e.g., 16 for 16th notes).
+        _repetitions (int): How often the pattern is played before the part ends, 0 to repeat it forever.
+        _steps_per_beat (int): The number of steps per beat.
+        _num_steps (int): The number of steps of one repetition.
+        _notes (list of dict): The notes of the pattern in the note format, plus their `step` and `dynamic` flag.
+    """
+
+    def __init__(self, beats_per_bar, note_value, subdivision, repetitions=1):
+        """
+        Initializes an empty StrangerStepPattern.
+
+        Args:
+            beats_per_bar (list of int): A list specifying the number of beats per bar for each bar in the pattern.
+            note_value (int): The note value for the time signature (e.g., 4 for quarter notes).
+            subdivision (int): The subdivision the steps are counted in (e.g., 16 for 16th notes).
+            repetitions (int): How often the pattern is played before the part ends, 0 to repeat it forever.
+        """
+        self._beats_per_bar = beats_per_bar
+        self._note_value = note_value
+        self._subdivision = subdivision
+        self._repetitions = repetitions
+        self._steps_per_beat = subdivision // note_value
+        self._num_steps = sum(beats_per_bar) * self._steps_per_beat
+        self._notes = []
+
+    def get_step(self, bar, beat, offset=0):
+        """
+        Returns the step of a beat in the pattern.
+
+        Args:
+            bar (int): The bar, starting at 0.
+            beat (int): The beat in the bar, starting at 0.
+            offset (int): The number of steps after the beat.
+
+        Returns:
+            int: The step index.
+        """
+        return (sum(self._beats_per_bar[:bar]) + beat) * self._steps_per_beat + offset
+
+    def add_note(self, step, synth_name, pitch, amplitude, note_length, dynamic=False):
+        """
+        Adds a note to the pattern.
+
+        Args:
+            step (int): The step the note starts on.
+            synth_name (str): The name of the synthesizer.
+            pitch (int): The MIDI pitch of the note, ignored for dynamic notes.
+            amplitude (float): The amplitude of the note, ignored for dynamic notes.
+            note_length (int): The number of steps the note plays.
+            dynamic (bool): Whether pitch and amplitude are taken from `get_dynamic_note`.
+
+        Returns:
+            int: The index of the note.
+
+        Raises:
+            ValueError: If the step is outside of the pattern.
+        """
+        if not 0 <= step < self._num_steps:
+            raise ValueError(f"Step {step} is outside of the pattern of {self._num_steps} steps.")
+        self._notes.append({
+            "synth_name": synth_name,
+            "event": "note_start",
+            "pitch": pitch,
+            "amplitude": amplitude,
+            "note_length": note_length,
+            "step": step,
+            "dynamic": dynamic,
+        })
+        return len(self._notes) - 1
+
+    def get_dynamic_note(self, note_index):
+        """
+        Returns the pitch and amplitude a dynamic note plays next. Subclasses override this
+        to vary dynamic notes, by default they play the values they were added with.
+
+        Args:
+            note_index (int): The index of the note.
+
+        Returns:
+            tuple: The MIDI pitch (int) and amplitude (float).
+        """
+        note = self._notes[note_index]
+        return note["pitch"], note["amplitude"]
+
+    def get_notes(self):
+        """
+        Returns the notes of the pattern.
+
+        Returns:
+            list of dict: The notes with their `step` and `dynamic` flag.
+        """
+        return self._notes
+
+    def get_num_steps(self):
+        """
+        Returns the length of one repetition.
+
+        Returns:
+            int: The number of steps.
+        """
+        return self._num_steps
+
+    def get_repetitions(self):
+        """
+        Returns how often the pattern is played before the part ends.
+
+        Returns:
+            int: The number of repetitions, 0 if the pattern repeats forever.
+        """
+        return self._repetitions
+
+    def get_subdivision(self):
+        """
+        Returns the subdivision the steps are counted in.
+
+        Returns:
+            int: The subdivision (e.g., 16 for 16th notes).
+        """
+        return self._subdivision
+
+    def build(self, synthesizers, max_division=None):
+        """
+        Builds the native pattern for the step sequencer of the audio engine.
+
+        Args:
+            synthesizers (dict): The synthesizers of the song by name.
+            max_division (int, optional): The subdivision the song is played on. Steps and note
+                lengths are scaled to it. Defaults to the subdivision of the pattern.
+
+        Returns:
+            audio_engine.StepPattern: The native pattern, note indices are the same as in this pattern.
+
+        Raises:
+            ValueError: If `max_division` is not a multiple of the subdivision of the pattern.
+        """
+        import audio_engine  # Only building needs the engine, the pattern itself is pure Python
+
+        scale = self._get_scale(max_division)
+        pattern = audio_engine.StepPattern(self._num_steps * scale, self._repetitions)
+        for index, note in enumerate(self._notes):
+            pitch, amplitude = self.get_dynamic_note(index) if note["dynamic"] else (note["pitch"], note["amplitude"])
+            pattern.addNote(note["step"] * scale, synthesizers[note["synth_name"]], pitch, amplitude,
+                            note["note_length"] * scale, note["dynamic"])
+        return pattern
+
+    def update_dynamic_note(self, pattern, note_index):
+        """
+        Sets the next value of a dynamic note after the engine has played it.
+
+        Args:
+            pattern (audio_engine.StepPattern): The native pattern built from this pattern.
+            note_index (int): The index of the note.
+        """
+        pitch, amplitude = self.get_dynamic_note(note_index)
+        pattern.setNote(note_index, pitch, amplitude)
+
+    def _get_scale(self, max_division):
+        """
+        Returns the number of song subdivisions per step.
+
+        Args:
+            max_division (int or None): The subdivision the song is played on.
+
+        Returns:
+            int: The number of song subdivisions per step.
+        """
+        if max_division is None:
+            return 1
+        if max_division % self._subdivision != 0:
+            raise ValueError(f"The song subdivision {max_division} is not a multiple of the "
+                             f"pattern subdivision {self._subdivision}.")
+        return max_division // self._subdivision
+
+
+class StrangerNoteGeneratorStepPattern(StrangerNoteGenerator):
+    """
+    A note generator that plays a step pattern in Python, step by step.
+
+    Used where the native step sequencer is not available, like the offline renderer and the
+    event file export, so parts can provide the same pattern for both.
+
+    Attributes:
+        _pattern (StrangerStepPattern): The pattern to be played.
+        _notes_by_step (list of list of int): The indices of the notes starting on each step.
+        _position (int): The next step of the pattern.
+        _repetition (int): The number of completed repetitions.
+    """
+
+    def __init__(self, control_params, pattern):
+        """
+        Initializes the StrangerNoteGeneratorStepPattern.
+
+        Args:
+            control_params (audio_engine.ControlParameters): An instance of ControlParameters.
+            pattern (StrangerStepPattern): The pattern to be played.
+        """
+        super().__init__(control_params)
+        self._pattern = pattern
+        self._notes_by_step = [[] for _ in range(pattern.get_num_steps())]
+        for index, note in enumerate(pattern.get_notes()):
+            self._notes_by_step[note["step"]].append(index)
+        self._position = 0
+        self._repetition = 0
+
+    def get_subdivision(self):
+        """
+        Returns the subdivision the generator is called on.
+
+        Returns:
+            int: The subdivision of the pattern.
+        """
+        return self._pattern.get_subdivision()
+
+    def get_next_notes(self):
+        """
+        Returns the notes of the next step.
+
+        Returns:
+            list: The notes starting on the step, in the note format.
+        """
+        notes = []
+        for index in self._notes_by_step[self._position]:
+            note = self._pattern.get_notes()[index]
+            pitch, amplitude = self._pattern.get_dynamic_note(index) if note["dynamic"] else (note["pitch"], note["amplitude"])
+            notes.append({
+                "synth_name": note["synth_name"],
+                "event": "note_start",
+                "pitch": pitch,
+                "amplitude": amplitude,
+                "note_length": note["note_length"],
+            })
+
+        self._position += 1
+        if self._position == len(self._notes_by_step):
+            self._position = 0
+            self._repetition += 1
+        return notes
+
+    def get_part_can_end(self):
+        """
+        Returns whether all repetitions of the pattern have been played.
+
+        Returns:
+            bool: True after the last step of the last repetition, False otherwise.
+        """
+        repetitions = self._pattern.get_repetitions()
+        return repetitions > 0 and self._position == 0 and self._repetition >= repetitions
+
+    def get_part_end(self):
+        """
+        Ends the part once all repetitions of the pattern have been played.
+
+        Returns:
+            bool: True if the part ends, False otherwise.
+        """
+        return self.get_part_can_end()
+
+
+# Unit test for StrangerStepPattern
+if __name__ == "__main__":
+    import unittest
+
+    class TestStrangerStepPattern(unittest.TestCase):
+        def test_steps(self):
+            """
+            Test the step of beats in a pattern with bars of different length.
+            """
+            pattern = StrangerStepPattern([3, 4], 4, 8)
+            self.assertEqual(pattern.get_num_steps(), 14)
+            self.assertEqual(pattern.get_step(1, 2, 1), 11)
+            with self.assertRaises(ValueError):
+                pattern.add_note(14, "bass", 36, 1.0, 1)
+
+        def test_note_generator(self):
+            """
+            Test that the Python fallback plays the pattern and its dynamic notes, then ends the part.
+            """
+            class CountingPattern(StrangerStepPattern):
+                def get_dynamic_note(self, note_index):
+                    self.calls = getattr(self, "calls", 0) + 1
+                    return 60 + self.calls, 0.5
+
+            pattern = CountingPattern([2], 4, 4, repetitions=2)
+            pattern.add_note(0, "lead", 0, 0.0, 1, dynamic=True)
+            pattern.add_note(1, "bass", 36, 1.0, 1)
+            generator = StrangerNoteGeneratorStepPattern(None, pattern)
+
+            notes = [generator.get_next_notes() for _ in range(4)]
+            self.assertEqual([[n["pitch"] for n in step] for step in notes], [[61], [36], [62], [36]])
+            self.assertTrue(generator.get_part_end())
+
+    # Run the tests
+    unittest.main()
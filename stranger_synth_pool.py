@@ -0,0 +1,209 @@
+from audio_engine import MAX_EFFECT_BUSES, TonicSimpleADSRFilterSynth
+
+
+class StrangerSynthPool:
+    """
+    A pool of `TonicSimpleADSRFilterSynth` instances keyed by their configuration.
+
+    Building a synth builds a complete Tonic generator graph. The pool builds synths ahead of
+    time with `prewarm`, so parts and sessions that need synths while a song plays get a ready
+    instance. Released synths are faded out and recycled for the next request of the same
+    configuration.
+
+    Attributes:
+        _free (dict): The list of free synths of each configuration.
+        _in_use (dict): The configuration of each acquired synth, by the id of the synth.
+        _registrations (dict): The acquired synth of each (target, synth name) registered with `register`.
+        _created (int): The number of synths built by the pool.
+        _reused (int): The number of requests served with a recycled synth.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty StrangerSynthPool.
+        """
+        self._free = {}
+        self._in_use = {}
+        self._registrations = {}
+        self._created = 0
+        self._reused = 0
+
+    def prewarm(self, count, waveform, attack, decay, sustain, release, base_filter_freq, filter_q):
+        """
+        Builds synths of a configuration ahead of time, until `count` of them are free.
+
+        Args:
+            count (int): The number of free synths to have available.
+            waveform (str): "SineWave", "SquareWave" or "SawtoothWave".
+            attack (float): The attack time of the envelope in seconds.
+            decay (float): The decay time of the envelope in seconds.
+            sustain (float): The sustain level of the envelope.
+            release (float): The release time of the envelope in seconds.
+            base_filter_freq (float): The filter cutoff in Hz, half the note frequency is added to it.
+            filter_q (float): The resonance of the filter.
+        """
+        config = (waveform, attack, decay, sustain, release, base_filter_freq, filter_q)
+        free = self._free.setdefault(config, [])
+        while len(free) < count:
+            free.append(TonicSimpleADSRFilterSynth(*config))
+            self._created += 1
+
+    def acquire(self, waveform, attack, decay, sustain, release, base_filter_freq, filter_q):
+        """
+        Hands out a synth of a configuration, recycled if one is free, built otherwise.
+
+        Args:
+            waveform (str): "SineWave", "SquareWave" or "SawtoothWave".
+            attack (float): The attack time of the envelope in seconds.
+            decay (float): The decay time of the envelope in seconds.
+            sustain (float): The sustain level of the envelope.
+            release (float): The release time of the envelope in seconds.
+            base_filter_freq (float): The filter cutoff in Hz, half the note frequency is added to it.
+            filter_q (float): The resonance of the filter.
+
+        Returns:
+            TonicSimpleADSRFilterSynth: A synth that is not used by anyone else.
+        """
+        config = (waveform, attack, decay, sustain, release, base_filter_freq, filter_q)
+        free = self._free.get(config)
+        if free:
+            synth = free.pop()
+            self._reused += 1
+        else:
+            synth = TonicSimpleADSRFilterSynth(*config)
+            self._created += 1
+        self._in_use[id(synth)] = (config, synth)
+        return synth
+
+    def release(self, synth):
+        """
+        Returns a synth to the pool. It must not be registered with an engine or session anymore.
+
+        A note still held or in its release is faded out right away, which renders the release
+        time of the synth on the calling thread, so the next user does not hear its tail.
+
+        Args:
+            synth (TonicSimpleADSRFilterSynth): A synth handed out by `acquire`.
+
+        Raises:
+            ValueError: If the synth was not handed out by this pool.
+        """
+        entry = self._in_use.pop(id(synth), None)
+        if entry is None:
+            raise ValueError("The synth was not acquired from this pool.")
+        config, synth = entry
+        # Do not carry a held note, its release or effect sends over to the next user
+        synth.silence()
+        for bus in range(MAX_EFFECT_BUSES):
+            synth.setSend(bus, 0.0)
+        self._free.setdefault(config, []).append(synth)
+
+    def register(self, target, synth_name, waveform, attack, decay, sustain, release, base_filter_freq, filter_q):
+        """
+        Acquires a synth and registers it with an engine or session.
+
+        Args:
+            target (AudioEngine or AudioSession): Where the synth is registered.
+            synth_name (str): The name the synth is registered under.
+            waveform (str): "SineWave", "SquareWave" or "SawtoothWave".
+            attack (float): The attack time of the envelope in seconds.
+            decay (float): The decay time of the envelope in seconds.
+            sustain (float): The sustain level of the envelope.
+            release (float): The release time of the envelope in seconds.
+            base_filter_freq (float): The filter cutoff in Hz, half the note frequency is added to it.
+            filter_q (float): The resonance of the filter.
+
+        Returns:
+            TonicSimpleADSRFilterSynth: The registered synth.
+        """
+        synth = self.acquire(waveform, attack, decay, sustain, release, base_filter_freq, filter_q)
+        target.registerSynth(synth_name, synth)
+        self._registrations[(id(target), synth_name)] = synth
+        return synth
+
+    def unregister(self, target, synth_name):
+        """
+        Unregisters a synth registered with `register` and returns it to the pool.
+
+        Args:
+            target (AudioEngine or AudioSession): Where the synth is registered.
+            synth_name (str): The name the synth is registered under.
+
+        Raises:
+            KeyError: If no synth of this pool is registered under the name.
+        """
+        synth = self._registrations.pop((id(target), synth_name))
+        target.unregisterSynth(synth_name)
+        self.release(synth)
+
+    def get_stats(self):
+        """
+        Returns how the pool served its requests.
+
+        Returns:
+            dict: The number of `created` and `reused` synths, and the number of `free` and `in_use` synths.
+        """
+        return {
+            "created": self._created,
+            "reused": self._reused,
+            "free": sum(len(free) for free in self._free.values()),
+            "in_use": len(self._in_use),
+        }
+
+
+# Unit test for StrangerSynthPool
+if __name__ == "__main__":
+    import unittest
+    from audio_engine import AudioEngine, ControlParameters
+
+    class TestStrangerSynthPool(unittest.TestCase):
+        def test_recycling(self):
+            """
+            Test that prewarmed and released synths are handed out again, per configuration.
+            """
+            pool = StrangerSynthPool()
+            config = ("SquareWave", 0.05, 0.1, 0.6, 0.4, 250.0, 1.0)
+            pool.prewarm(2, *config)
+            first = pool.acquire(*config)
+            second = pool.acquire(*config)
+            third = pool.acquire("SineWave", *config[1:])
+            self.assertEqual(pool.get_stats(), {"created": 3, "reused": 2, "free": 0, "in_use": 3})
+
+            pool.release(first)
+            self.assertIs(pool.acquire(*config), first)
+            self.assertIsNot(second, third)
+            with self.assertRaises(ValueError):
+                pool.release(TonicSimpleADSRFilterSynth(*config))
+
+        def test_register(self):
+            """
+            Test that unregistering removes the synth from the engine and recycles it.
+            """
+            pool = StrangerSynthPool()
+            control_params = ControlParameters()
+            engine = AudioEngine(control_params)
+            session = engine.createSession("pool", control_params)
+            config = ("SawtoothWave", 0.01, 0.1, 0.5, 0.2, 500.0, 1.0)
+            synth = pool.register(session, "lead", *config)
+            self.assertEqual(session.getSynthCount(), 1)
+
+            pool.unregister(session, "lead")
+            self.assertEqual(session.getSynthCount(), 0)
+            self.assertIs(pool.register(session, "bass", *config), synth)
+
+        def test_release_resets_sends(self):
+            """
+            Test that a released synth does not feed any effect bus when it is handed out again.
+            """
+            pool = StrangerSynthPool()
+            config = ("SineWave", 0.01, 0.1, 0.5, 0.2, 500.0, 1.0)
+            synth = pool.acquire(*config)
+            for bus in range(MAX_EFFECT_BUSES):
+                synth.setSend(bus, 0.5)
+
+            pool.release(synth)
+            self.assertIs(pool.acquire(*config), synth)
+            self.assertEqual([synth.getSend(bus) for bus in range(MAX_EFFECT_BUSES)], [0.0] * MAX_EFFECT_BUSES)
+
+    # Run the tests
+    unittest.main()
@@ -0,0 +1,245 @@
+from bisect import bisect_left, bisect_right
+
+
+class StrangerTempoMap:
+    """
+    A piecewise constant tempo over the subdivision grid of a song.
+
+    The map consists of segments, each starting at a subdivision with its own tempo. The
+    time offset of every segment start is precomputed, so converting between a subdivision
+    index and seconds is a binary search over the segments.
+
+    Attributes:
+        _max_division (int): The subdivision grid of the song (e.g., 16 for 16th notes).
+        _starts (list of int): The first subdivision of each segment, the first one is 0.
+        _bpms (list of float): The tempo of each segment in beats (quarter notes) per minute.
+        _durations (list of float): The duration of one subdivision in seconds for each segment.
+        _offsets (list of float): The time in seconds at the start of each segment.
+    """
+
+    def __init__(self, bpm, max_division):
+        """
+        Initializes the StrangerTempoMap with a constant tempo.
+
+        Args:
+            bpm (float): The initial beats per minute.
+            max_division (int): The subdivision grid of the song (e.g., 16 for 16th notes).
+        """
+        self._max_division = max_division
+        self._starts = [0]
+        self._bpms = [bpm]
+        self._durations = [self._get_duration(bpm)]
+        self._offsets = [0.0]
+
+    def _get_duration(self, bpm):
+        """
+        Computes the duration of one subdivision at a tempo.
+
+        Args:
+            bpm (float): The beats per minute.
+
+        Returns:
+            float: The duration of one subdivision in seconds.
+        """
+        return 60 / bpm / (self._max_division / 4)
+
+    def get_max_division(self):
+        """
+        Returns the subdivision grid of the tempo map.
+
+        Returns:
+            int: The maximum division (e.g., 16 for 16th notes).
+        """
+        return self._max_division
+
+    def copy(self):
+        """
+        Returns an independent copy of the tempo map.
+
+        Returns:
+            StrangerTempoMap: A tempo map with the same tempo changes.
+        """
+        tempo_map = StrangerTempoMap(self._bpms[0], self._max_division)
+        tempo_map._starts = list(self._starts)
+        tempo_map._bpms = list(self._bpms)
+        tempo_map._durations = list(self._durations)
+        tempo_map._offsets = list(self._offsets)
+        return tempo_map
+
+    def set_tempo(self, subdivision, bpm):
+        """
+        Changes the tempo from a subdivision on, up to the next tempo change.
+
+        Args:
+            subdivision (int): The subdivision at which the tempo changes.
+            bpm (float): The new beats per minute.
+        """
+        index = bisect_left(self._starts, subdivision)
+        if index < len(self._starts) and self._starts[index] == subdivision:
+            self._bpms[index] = bpm
+            self._durations[index] = self._get_duration(bpm)
+        else:
+            self._starts.insert(index, subdivision)
+            self._bpms.insert(index, bpm)
+            self._durations.insert(index, self._get_duration(bpm))
+            self._offsets.insert(index, 0.0)
+        self._update_offsets(index)
+
+    def add_ramp(self, start_subdivision, end_subdivision, start_bpm, end_bpm):
+        """
+        Changes the tempo linearly over a range of subdivisions (accelerando or ritardando).
+
+        Every subdivision in the range gets its own segment, tempo changes inside the range are
+        replaced. The tempo stays at `end_bpm` from `end_subdivision` on.
+
+        Args:
+            start_subdivision (int): The first subdivision of the ramp.
+            end_subdivision (int): The subdivision at which `end_bpm` is reached.
+            start_bpm (float): The beats per minute at the start of the ramp.
+            end_bpm (float): The beats per minute at the end of the ramp.
+        """
+        first = bisect_left(self._starts, start_subdivision)
+        last = bisect_right(self._starts, end_subdivision)
+        ramp_length = end_subdivision - start_subdivision
+
+        starts = list(range(start_subdivision, end_subdivision + 1))
+        bpms = [start_bpm + (end_bpm - start_bpm) * step / ramp_length for step in range(ramp_length)] + [end_bpm]
+        self._starts[first:last] = starts
+        self._bpms[first:last] = bpms
+        self._durations[first:last] = [self._get_duration(bpm) for bpm in bpms]
+        self._offsets[first:last] = [0.0] * len(starts)
+        self._update_offsets(first)
+
+    def _update_offsets(self, index):
+        """
+        Recomputes the time offsets of all segments from `index` on.
+
+        Args:
+            index (int): The first segment whose offset changed.
+        """
+        for i in range(max(index, 1), len(self._starts)):
+            self._offsets[i] = self._offsets[i - 1] + (self._starts[i] - self._starts[i - 1]) * self._durations[i - 1]
+
+    def get_bpm(self, subdivision):
+        """
+        Returns the tempo at a subdivision.
+
+        Args:
+            subdivision (int): The subdivision index.
+
+        Returns:
+            float: The beats per minute.
+        """
+        return self._bpms[bisect_right(self._starts, subdivision) - 1]
+
+    def get_subdivision_duration(self, subdivision):
+        """
+        Returns the duration of a subdivision.
+
+        Args:
+            subdivision (int): The subdivision index.
+
+        Returns:
+            float: The duration in seconds.
+        """
+        return self._durations[bisect_right(self._starts, subdivision) - 1]
+
+    def subdivision_to_seconds(self, subdivision):
+        """
+        Converts a (possibly fractional) subdivision index to the time since the start of the song.
+
+        Args:
+            subdivision (float): The subdivision index.
+
+        Returns:
+            float: The time in seconds.
+        """
+        index = bisect_right(self._starts, subdivision) - 1
+        return self._offsets[index] + (subdivision - self._starts[index]) * self._durations[index]
+
+    def seconds_to_subdivision(self, seconds):
+        """
+        Converts a time since the start of the song to a fractional subdivision index.
+
+        Args:
+            seconds (float): The time in seconds.
+
+        Returns:
+            float: The subdivision index.
+        """
+        index = bisect_right(self._offsets, seconds) - 1
+        return self._starts[index] + (seconds - self._offsets[index]) / self._durations[index]
+
+    def get_tempo_changes(self, start_subdivision=0, end_subdivision=None):
+        """
+        Returns the tempo changes in a range of subdivisions.
+
+        Args:
+            start_subdivision (int): The first subdivision of the range.
+            end_subdivision (int, optional): The subdivision after the range. Defaults to the end of the map.
+
+        Returns:
+            list of tuple: (subdivision, bpm) pairs in subdivision order.
+        """
+        first = bisect_left(self._starts, start_subdivision)
+        last = len(self._starts) if end_subdivision is None else bisect_left(self._starts, end_subdivision)
+        return list(zip(self._starts[first:last], self._bpms[first:last]))
+
+
+# Unit test for StrangerTempoMap
+if __name__ == "__main__":
+    import unittest
+
+    class TestStrangerTempoMap(unittest.TestCase):
+        def test_constant_tempo(self):
+            """
+            Test the conversion at a constant tempo.
+            """
+            tempo_map = StrangerTempoMap(120, 16)
+            self.assertAlmostEqual(tempo_map.get_subdivision_duration(0), 0.125)
+            self.assertAlmostEqual(tempo_map.subdivision_to_seconds(16), 2.0)
+            self.assertAlmostEqual(tempo_map.seconds_to_subdivision(2.0), 16)
+
+        def test_tempo_changes(self):
+            """
+            Test the conversion across tempo changes, including one inserted before a later change.
+            """
+            tempo_map = StrangerTempoMap(120, 4)
+            tempo_map.set_tempo(8, 240)
+            tempo_map.set_tempo(4, 60)
+            self.assertEqual(tempo_map.get_tempo_changes(), [(0, 120), (4, 60), (8, 240)])
+            self.assertEqual(tempo_map.get_tempo_changes(1, 8), [(4, 60)])
+            self.assertEqual(tempo_map.get_bpm(7), 60)
+            # 4 beats at 0.5s, 4 beats at 1s, then 0.25s per beat
+            self.assertAlmostEqual(tempo_map.subdivision_to_seconds(4), 2.0)
+            self.assertAlmostEqual(tempo_map.subdivision_to_seconds(8), 6.0)
+            self.assertAlmostEqual(tempo_map.subdivision_to_seconds(10), 6.5)
+            self.assertAlmostEqual(tempo_map.seconds_to_subdivision(4.0), 6)
+            self.assertAlmostEqual(tempo_map.seconds_to_subdivision(6.5), 10)
+
+        def test_ramp(self):
+            """
+            Test that a ramp changes the tempo every subdivision and ends on the target tempo.
+            """
+            tempo_map = StrangerTempoMap(60, 4)
+            tempo_map.set_tempo(2, 200)
+            tempo_map.add_ramp(0, 4, 60, 120)
+            self.assertEqual(tempo_map.get_tempo_changes(), [(0, 60), (1, 75), (2, 90), (3, 105), (4, 120)])
+            self.assertAlmostEqual(tempo_map.subdivision_to_seconds(4), 1 + 60 / 75 + 60 / 90 + 60 / 105)
+            self.assertEqual(tempo_map.get_bpm(100), 120)
+
+        def test_copy(self):
+            """
+            Test that changing a copy leaves the original tempo map unchanged.
+            """
+            tempo_map = StrangerTempoMap(120, 4)
+            tempo_map.set_tempo(4, 60)
+            copy = tempo_map.copy()
+            copy.set_tempo(0, 90)
+            copy.set_tempo(8, 240)
+            self.assertEqual(tempo_map.get_tempo_changes(), [(0, 120), (4, 60)])
+            self.assertAlmostEqual(tempo_map.subdivision_to_seconds(8), 6.0)
+            self.assertEqual(copy.get_tempo_changes(), [(0, 90), (4, 60), (8, 240)])
+
+    # Run the tests
+    unittest.main()
@@ -0,0 +1,204 @@
+import json
+import time
+
+
+class StrangerTracer:
+    """
+    Records the duration of the phases of the playback loop.
+
+    Every recorded phase is tagged with the name of the part and the subdivision it belongs to.
+    The recording can be exported as Chrome trace JSON (viewable in chrome://tracing or
+    https://ui.perfetto.dev) or summarized per phase.
+
+    Attributes:
+        _events (list): Recorded (phase, start_ns, duration_ns, part_name, subdivision) tuples.
+            Instant events have a duration of None.
+        _max_events (int): The maximum number of events kept in memory.
+        _dropped_events (int): The number of events not recorded because `_max_events` was reached.
+        _origin_ns (int): The timestamp all exported timestamps are relative to.
+    """
+
+    def __init__(self, max_events=1_000_000):
+        """
+        Initializes the StrangerTracer.
+
+        Args:
+            max_events (int): The maximum number of events kept in memory.
+        """
+        self._events = []
+        self._max_events = max_events
+        self._dropped_events = 0
+        self._origin_ns = time.perf_counter_ns()
+
+    @staticmethod
+    def now():
+        """
+        Returns the current timestamp in the clock used by the tracer.
+
+        Returns:
+            int: The timestamp in nanoseconds.
+        """
+        return time.perf_counter_ns()
+
+    def record(self, phase, start_ns, part_name, subdivision):
+        """
+        Records a phase that started at `start_ns` and ends now.
+
+        Args:
+            phase (str): The name of the phase.
+            start_ns (int): The start timestamp as returned by `now`.
+            part_name (str): The name of the part being played.
+            subdivision (int): The subdivision index being played.
+
+        Returns:
+            int: The end timestamp, which can be used as the start of the next phase.
+        """
+        end_ns = time.perf_counter_ns()
+        if len(self._events) < self._max_events:
+            self._events.append((phase, start_ns, end_ns - start_ns, part_name, subdivision))
+        else:
+            self._dropped_events += 1
+        return end_ns
+
+    def record_instant(self, name, part_name, subdivision):
+        """
+        Records an instant event, e.g. a loop that took longer than the update interval.
+
+        Args:
+            name (str): The name of the event.
+            part_name (str): The name of the part being played.
+            subdivision (int): The subdivision index being played.
+        """
+        if len(self._events) < self._max_events:
+            self._events.append((name, time.perf_counter_ns(), None, part_name, subdivision))
+        else:
+            self._dropped_events += 1
+
+    def clear(self):
+        """
+        Removes all recorded events.
+        """
+        self._events = []
+        self._dropped_events = 0
+        self._origin_ns = time.perf_counter_ns()
+
+    def get_summary(self):
+        """
+        Computes statistics of the recorded durations per phase.
+
+        Returns:
+            dict: A mapping of phase names to dictionaries with `count`, `total_ms`,
+                  `mean_ms`, `p95_ms` and `max_ms`, plus the count of instant events.
+        """
+        durations = {}
+        for phase, _, duration_ns, _, _ in self._events:
+            durations.setdefault(phase, []).append(duration_ns)
+
+        summary = {}
+        for phase, phase_durations in durations.items():
+            if phase_durations[0] is None:
+                summary[phase] = {"count": len(phase_durations)}
+                continue
+            phase_durations.sort()
+            total_ns = sum(phase_durations)
+            summary[phase] = {
+                "count": len(phase_durations),
+                "total_ms": total_ns / 1e6,
+                "mean_ms": total_ns / len(phase_durations) / 1e6,
+                "p95_ms": phase_durations[int(0.95 * (len(phase_durations) - 1))] / 1e6,
+                "max_ms": phase_durations[-1] / 1e6,
+            }
+        return summary
+
+    def print_summary(self):
+        """
+        Prints the per phase statistics, the most expensive phase first.
+        """
+        summary = self.get_summary()
+        print(f"{'phase':<20} {'count':>8} {'total ms':>10} {'mean ms':>9} {'p95 ms':>9} {'max ms':>9}")
+        for phase, stats in sorted(summary.items(), key=lambda item: -item[1].get("total_ms", 0)):
+            if "total_ms" not in stats:
+                print(f"{phase:<20} {stats['count']:>8}")
+                continue
+            print(f"{phase:<20} {stats['count']:>8} {stats['total_ms']:>10.3f} {stats['mean_ms']:>9.4f} "
+                  f"{stats['p95_ms']:>9.4f} {stats['max_ms']:>9.4f}")
+        if self._dropped_events > 0:
+            print(f"Warning: {self._dropped_events} events were dropped.")
+
+    def export_chrome_trace(self, filename):
+        """
+        Writes the recorded events as Chrome trace / Perfetto JSON.
+
+        Args:
+            filename (str): The path of the JSON file.
+        """
+        trace_events = []
+        for phase, start_ns, duration_ns, part_name, subdivision in self._events:
+            event = {
+                "name": phase,
+                "cat": "playback",
+                "ts": (start_ns - self._origin_ns) / 1e3,
+                "pid": 1,
+                "tid": 1,
+                "args": {"part": part_name, "subdivision": subdivision},
+            }
+            if duration_ns is None:
+                event["ph"] = "i"
+                event["s"] = "t"
+            else:
+                event["ph"] = "X"
+                event["dur"] = duration_ns / 1e3
+            trace_events.append(event)
+
+        with open(filename, "w") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+        print(f"Trace saved as {filename}.")
+
+
+# Unit test for StrangerTracer
+if __name__ == "__main__":
+    import os
+    import tempfile
+    import unittest
+
+    class TestStrangerTracer(unittest.TestCase):
+        def test_summary_and_export(self):
+            """
+            Test that recorded phases are summarized and exported as complete events.
+            """
+            tracer = StrangerTracer()
+            for subdivision in range(3):
+                start = tracer.now()
+                start = tracer.record("get_next_notes", start, "Intro", subdivision)
+                tracer.record("note_on_engine", start, "Intro", subdivision)
+            tracer.record_instant("loop_overrun", "Intro", 2)
+
+            summary = tracer.get_summary()
+            self.assertEqual(summary["get_next_notes"]["count"], 3)
+            self.assertEqual(summary["note_on_engine"]["count"], 3)
+            self.assertEqual(summary["loop_overrun"], {"count": 1})
+
+            handle, filename = tempfile.mkstemp(suffix=".json")
+            os.close(handle)
+            try:
+                tracer.export_chrome_trace(filename)
+                with open(filename) as f:
+                    trace_events = json.load(f)["traceEvents"]
+            finally:
+                os.remove(filename)
+            self.assertEqual(len(trace_events), 7)
+            self.assertEqual(trace_events[0]["ph"], "X")
+            self.assertEqual(trace_events[0]["args"], {"part": "Intro", "subdivision": 0})
+            self.assertEqual(trace_events[-1]["ph"], "i")
+
+        def test_max_events(self):
+            """
+            Test that events beyond the limit are dropped.
+            """
+            tracer = StrangerTracer(max_events=2)
+            for subdivision in range(5):
+                tracer.record("tick", tracer.now(), "Intro", subdivision)
+            self.assertEqual(tracer.get_summary()["tick"]["count"], 2)
+
+    # Run the tests
+    unittest.main()